@@ -1,15 +1,41 @@
 import asyncio
+import base64
+import bisect
+import contextvars
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
 import random
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from fastapi import FastAPI, HTTPException, Request, Response
+import sys
+import uuid
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 import datetime
 from pytz import timezone
 from bson import ObjectId
-from typing import Dict, Optional, List, Union
+from bson.errors import InvalidId
+from typing import AsyncIterator, Dict, Literal, Optional, List, Union
 from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import edge_tts
+import httpx
 import io
+import numpy as np
+
+try:
+    import orjson  # 可选依赖，安装后卡片响应的序列化更快
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger('wordie')
 
 
 # 计算文本中中文字符的数量
@@ -18,7 +44,41 @@ def count_chinese_chars(text):
     return chinese_char_count
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await db_manager.ensure_indexes()
+        await db_manager.verify_query_plans()
+    except Exception as e:
+        logger.warning('索引初始化失败，服务继续启动: %s', e)
+    db_manager.writer.start()
+    db_manager.click_logs.start()
+    try:
+        logger.info('音节词典已加载 %d 个单词', await db_manager.syllables.load())
+    except Exception as e:
+        logger.warning('音节词典加载失败，退回数据库查询: %s', e)
+    if not Config.STATELESS:
+        # 无状态模式下各进程的内存堆无法互相感知，直接使用数据库查询
+        try:
+            await review_scheduler.load()
+        except Exception as e:
+            logger.warning('复习调度器加载失败，退回数据库查询: %s', e)
+        try:
+            await new_word_queue.load()
+        except Exception as e:
+            logger.warning('新词队列加载失败，退回数据库查询: %s', e)
+    audio_prefetcher.start()
+    stats_broadcaster.start()
+    yield
+    await stats_broadcaster.stop()
+    await audio_prefetcher.stop()
+    await db_manager.writer.stop()
+    await db_manager.click_logs.stop()
+    await close_tts_client()
+    await db_manager.client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,38 +92,688 @@ app.add_middleware(
 # ====================== 配置模块 ======================
 class Config:
     INITIAL_INTERVAL = 5 * 60  # 初始间隔（秒）
-    DB_HOST = 'mongodb://localhost:27017/'
-    USER_DB_NAME = 'word_learning_v7'
+    # 数据库和音频相关配置可以通过环境变量覆盖，基准测试用它们指向独立的库和假 TTS 服务
+    DB_HOST = os.getenv('WORDIE_DB_HOST', 'mongodb://localhost:27017/')
+    USER_DB_NAME = os.getenv('WORDIE_USER_DB', 'word_learning_v7')
     USER_COLLECTION = 'user_words'
     TIMEZONE_UTC = timezone('UTC')
     LOG_COLLECTION = 'click_logs'
-    MASTERED_DB_NAME = 'mastered_words_db'  # 新的数据库名
+    MASTERED_DB_NAME = os.getenv('WORDIE_MASTERED_DB', 'mastered_words_db')  # 新的数据库名
+    SOURCE_DB_NAME = os.getenv('WORDIE_SOURCE_DB', 'LLMGenSentence')  # 音节等源数据所在的库
     MASTERED_COLLECTION = 'mastered_words'  # 新的集合名
     LAST_FIVE_WORDS_COLLECTION = 'last_five_words'  # 新增：存储前五个单词的集合名
+    DAILY_COUNTS_COLLECTION = 'daily_counts'  # 每个学习者每天的作答次数
+    LEARNER_TIMEZONE = timezone(os.getenv('WORDIE_TIMEZONE', 'Asia/Shanghai'))  # 按此时区划分“今天”
     MAX_LAST_WORDS_COUNT = 15  # 最多存储 15 个单词
+    AUDIO_CACHE_DIR = os.getenv(
+        'WORDIE_AUDIO_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio_cache')
+    )  # 音频磁盘缓存目录
+    AUDIO_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 磁盘缓存上限（字节），超出后按 LRU 淘汰
+    AUDIO_MEMORY_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 内存缓存上限（字节）
+    TTS_BACKEND_URL = os.getenv('WORDIE_TTS_URL')  # 设置后改为向该 HTTP 服务请求音频（GET ?text=&voice=），否则使用 edge_tts
+    TTS_MAX_RETRIES = 3  # 语音合成最大尝试次数
+    TTS_RETRY_DELAY = 0.5  # 首次重试前的退避基数（秒），之后每次翻倍并加随机抖动
+    TTS_RETRY_MAX_DELAY = 8  # 单次退避等待的上限（秒）
+    TTS_CONCURRENCY = 8  # 全局同时向 TTS 后端发起的合成数，接口、批量接口和预取共用
+    TTS_BATCH_MAX_TEXTS = 20  # 批量合成接口单次最多处理的文本数
+    PREFETCH_QUEUE_SIZE = 200  # 音频预取队列上限，满了直接丢弃新任务
+    PREFETCH_CONCURRENCY = 2  # 预取时同时向 TTS 发起的合成数
+    PREFETCH_LOOKAHEAD = 3  # 额外预取接下来可能出现的卡片数
+    STATS_CACHE_TTL = 10  # 状态计数缓存有效期（秒），到期后重新聚合
+    STATS_PUSH_HEARTBEAT = 15  # 推送连接的心跳间隔（秒）；调度器未加载时也按此间隔重新统计
+    WRITE_BEHIND_BATCH_SIZE = 500  # 写回队列单次 bulk_write 的最大条数
+    WRITE_BEHIND_RETRY_DELAY = 1  # 写回失败后的重试间隔（秒）
+    DEFAULT_LEARNER_ID = 'default'  # 请求未携带 X-Learner-Id 时使用的学习者
+    WORKERS = int(os.getenv('WORDIE_WORKERS', '1'))  # uvicorn 工作进程数
+    # 无状态模式：进程内不保存任何学习状态（复习调度堆、新词队列、写回队列、今日作答数、增量日志列），
+    # 每次都直接读写数据库。多台机器经负载均衡部署时必须设置 WORDIE_STATELESS=1；单机多进程时自动启用
+    STATELESS = os.getenv('WORDIE_STATELESS', '0') == '1' or WORKERS > 1
+    MAX_BATCH_SIZE = 50  # 批量取词/批量提交的最大条数
+    # 新词出词顺序：逗号分隔的字段名，前缀 - 表示降序；最后按 _id 保证顺序稳定
+    NEW_WORD_ORDER = [
+        (field.strip().lstrip('-'), DESCENDING if field.strip().startswith('-') else ASCENDING)
+        for field in os.getenv('WORDIE_NEW_WORD_ORDER', 'number,line_number').split(',') if field.strip()
+    ] + [('_id', ASCENDING)]
+    DAILY_NEW_WORD_LIMIT = int(os.getenv('WORDIE_DAILY_NEW_WORDS', '0'))  # 每个学习者每天最多学习的新词数，0 表示不限
+    SYLLABLE_LOAD_BATCH_SIZE = 5000  # 启动时加载音节词典的游标批大小
+    CLICK_LOG_QUEUE_SIZE = 5000  # 点击日志缓冲上限，满了以后写入方等待（背压）
+    CLICK_LOG_BATCH_SIZE = 200  # 攒够这么多条立即写库
+    CLICK_LOG_FLUSH_INTERVAL = 1.0  # 第一条日志入队后最多等待多久写库（秒）
+    LOG_LEVEL = os.getenv('WORDIE_LOG_LEVEL', 'INFO').upper()  # DEBUG 时逐条记录请求耗时，OFF 关闭日志
+    METRICS_ENABLED = os.getenv('WORDIE_METRICS', '1') != '0'  # 关闭后不再记录请求和 Mongo 命令指标
+    GZIP_ENABLED = os.getenv('WORDIE_GZIP', '1') != '0'  # 客户端支持时压缩卡片和统计响应
+    GZIP_MIN_BYTES = 1024  # 小于该大小的响应不压缩
+    GZIP_LEVEL = 5
+    ANALYTICS_BATCH_SIZE = 10000  # 读取点击日志的游标批大小
+    ANALYTICS_CACHE_TTL = 60  # 分析结果最长缓存时间（秒），无状态模式下其他进程写入的日志靠它生效
+    ANALYTICS_RELOAD_INTERVAL = 600  # 列式日志缓存多久整体重建一次（秒），其余时间只追加新日志
+    ANALYTICS_MIN_ATTEMPTS = 3  # 进入“最难单词”榜单所需的最少作答次数
+    ANALYTICS_HARDEST_LIMIT = 20
+    FORECAST_MAX_DAYS = 90  # 复习量预测最多模拟的天数
+    FORECAST_RUNS = 100  # 蒙特卡洛默认模拟次数
+    FORECAST_MAX_SAMPLES = 1_000_000  # 同时推进的轨迹数上限（按此分块，限制内存）
+    FORECAST_MAX_REVIEWS = 20_000_000  # 单次预测最多模拟的复习次数，超出时减少模拟次数或抽样卡片
+    FORECAST_PILOT_CARDS = 1000  # 试算每张卡片复习次数时抽取的卡片数
+    FORECAST_SAMPLED_RUNS = 10  # 需要抽样卡片时的模拟次数
+
+
+# ====================== 监控模块 ======================
+def setup_logging():
+    """只配置 wordie 自己的 logger，不影响 uvicorn 的日志设置"""
+    if Config.LOG_LEVEL == 'OFF':
+        logger.disabled = True
+        return
+    if logger.handlers:
+        # python app.py 时模块会以 __main__ 和 app 各导入一次，只添加一个 handler
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(Config.LOG_LEVEL)
+    logger.propagate = False
+
+
+setup_logging()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+DOCS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _format_labels(labelnames, values, extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class MetricHistogram:
+    """Prometheus 直方图，按标签值分别累计各桶计数、总和与次数"""
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # 标签值 -> [各桶计数（非累计）, 总和, 次数]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class MetricCounter:
+    """Prometheus 计数器"""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Metrics:
+    """进程内的全部指标；多进程部署时每个进程各自统计"""
+
+    def __init__(self):
+        self.http_duration = MetricHistogram(
+            'wordie_http_request_duration_seconds', '请求处理耗时', ('method', 'endpoint', 'status'))
+        self.request_mongo_commands = MetricHistogram(
+            'wordie_request_mongo_commands', '每个请求发出的 Mongo 命令数', ('endpoint',), COUNT_BUCKETS)
+        self.request_mongo_seconds = MetricHistogram(
+            'wordie_request_mongo_seconds', '每个请求在 Mongo 命令上累计花费的时间', ('endpoint',))
+        self.request_mongo_docs = MetricHistogram(
+            'wordie_request_mongo_documents', '每个请求从 Mongo 取回的文档数', ('endpoint',), DOCS_BUCKETS)
+        self.mongo_command_duration = MetricHistogram(
+            'wordie_mongo_command_duration_seconds', '单条 Mongo 命令耗时', ('endpoint', 'command'))
+        self.mongo_command_failures = MetricCounter(
+            'wordie_mongo_command_failures_total', '失败的 Mongo 命令数', ('endpoint', 'command'))
+        self.tts_duration = MetricHistogram(
+            'wordie_tts_synthesis_seconds', '一次成功的语音合成耗时', ('mode',))
+        self.tts_failures = MetricCounter(
+            'wordie_tts_failures_total', '语音合成失败次数，final=true 表示重试耗尽或下发中断', ('mode', 'final'))
+
+    def render(self) -> str:
+        lines = []
+        for metric in vars(self).values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class RequestTrace:
+    """一次请求内累计的 Mongo 与 TTS 开销，由中间件创建，监听器和合成函数往里记账"""
+    __slots__ = ('scope', 'mongo_commands', 'mongo_seconds', 'mongo_docs', 'tts_seconds', 'tts_failures')
+
+    def __init__(self, scope: Dict):
+        self.scope = scope
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.mongo_docs = 0
+        self.tts_seconds = 0.0
+        self.tts_failures = 0
+
+    @property
+    def endpoint(self) -> str:
+        # 路由匹配后用模板路径作标签，未匹配的请求归为 unmatched，避免标签无限增长
+        return getattr(self.scope.get('route'), 'path', 'unmatched')
+
+
+# 后台任务（写回队列、预取等）不在任何请求内，记为 background
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar('current_trace', default=None)
+
+
+def create_background_task(coro) -> asyncio.Task:
+    """在空白上下文中创建后台任务
+
+    asyncio.create_task 会复制当前上下文，在请求中创建的任务会继承 current_trace，
+    把之后的 Mongo 命令和 TTS 耗时记到发起的请求上。后台任务一律从空白上下文开始。
+    """
+    return asyncio.create_task(coro, context=contextvars.Context())
+
+
+def _reply_documents(reply) -> int:
+    """从命令回复中估算取回的文档数"""
+    cursor = reply.get('cursor')
+    if cursor:
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or ())
+    if reply.get('value') is not None:  # findAndModify
+        return 1
+    return 0
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """把每条 Mongo 命令的次数、耗时和返回文档数记到当前请求上"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if not Config.METRICS_ENABLED:
+            return
+        seconds = event.duration_micros / 1e6
+        trace = current_trace.get()
+        metrics.mongo_command_duration.observe(seconds, trace.endpoint if trace else 'background', event.command_name)
+        if trace is not None:
+            trace.mongo_commands += 1
+            trace.mongo_seconds += seconds
+            trace.mongo_docs += _reply_documents(event.reply)
+
+    def failed(self, event):
+        if not Config.METRICS_ENABLED:
+            return
+        trace = current_trace.get()
+        metrics.mongo_command_failures.inc(trace.endpoint if trace else 'background', event.command_name)
+        if trace is not None:
+            trace.mongo_commands += 1
+            trace.mongo_seconds += event.duration_micros / 1e6
+
+
+def record_tts(seconds: float, mode: str):
+    if not Config.METRICS_ENABLED:
+        return
+    metrics.tts_duration.observe(seconds, mode)
+    if trace := current_trace.get():
+        trace.tts_seconds += seconds
+
+
+def record_tts_failure(mode: str, final: bool):
+    if not Config.METRICS_ENABLED:
+        return
+    metrics.tts_failures.inc(mode, 'true' if final else 'false')
+    if trace := current_trace.get():
+        trace.tts_failures += 1
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：计时到响应体发送完毕（包括流式音频），按路由模板归类"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not Config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace(scope)
+        token = current_trace.set(trace)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            elapsed = time.perf_counter() - start
+            endpoint = trace.endpoint
+            metrics.http_duration.observe(elapsed, scope['method'], endpoint, status)
+            metrics.request_mongo_commands.observe(trace.mongo_commands, endpoint)
+            metrics.request_mongo_seconds.observe(trace.mongo_seconds, endpoint)
+            metrics.request_mongo_docs.observe(trace.mongo_docs, endpoint)
+            logger.debug(
+                'request method=%s endpoint=%s status=%d duration_ms=%.2f mongo_commands=%d mongo_ms=%.2f '
+                'mongo_docs=%d tts_ms=%.2f tts_failures=%d',
+                scope['method'], endpoint, status, elapsed * 1000, trace.mongo_commands, trace.mongo_seconds * 1000,
+                trace.mongo_docs, trace.tts_seconds * 1000, trace.tts_failures
+            )
+
+
+mongo_tracer = MongoCommandTracer()
+app.add_middleware(MetricsMiddleware)
 
 
 # ====================== 数据库模块 ======================
+def today_range():
+    """学习者时区中今天的起止时间
+
+    库里的时间戳都是 datetime.now() 产生的服务器本地 naive 时间，
+    所以起止点先在学习者时区里算出，再换算回服务器本地 naive 时间。
+    """
+    today = datetime.datetime.now(Config.LEARNER_TIMEZONE).date()
+    day_start, next_day_start = (
+        Config.LEARNER_TIMEZONE.localize(datetime.datetime.combine(day, datetime.time()))
+        for day in (today, today + datetime.timedelta(days=1))
+    )
+    today_start = day_start.astimezone().replace(tzinfo=None)
+    today_end = next_day_start.astimezone().replace(tzinfo=None) - datetime.timedelta(microseconds=1)
+    return today_start, today_end
+
+
+def learning_day(timestamp: datetime.datetime) -> str:
+    """服务器本地 naive 时间在学习者时区中所属的日期，作为每日计数的键"""
+    return timestamp.astimezone(Config.LEARNER_TIMEZONE).date().isoformat()
+
+
+def learner_filter(learner_id: str) -> Dict:
+    """按学习者过滤；默认学习者同时匹配引入学习者之前没有 learner_id 的旧数据"""
+    if learner_id == Config.DEFAULT_LEARNER_ID:
+        return {'learner_id': {'$in': [learner_id, None]}}
+    return {'learner_id': learner_id}
+
+
+def _plan_stages(plan: Dict) -> List[str]:
+    """递归收集 explain() 执行计划中的所有 stage 名称"""
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += _plan_stages(child)
+    return stages
+
+
+class StatusCounterCache:
+    """user_words 各状态数量的短期缓存
+
+    过期后用一次聚合重新统计；写路径能确定状态迁移时直接增减计数，
+    无法确定时（批量标熟、标注不好）整体失效。
+    """
+
+    def __init__(self, db: 'DatabaseManager', ttl: float):
+        self.db = db
+        self.ttl = ttl
+        self._counts: Optional[Dict[str, int]] = None
+        self._expires_at = 0.0
+
+    async def get(self) -> Dict[str, int]:
+        if self._counts is not None and time.monotonic() < self._expires_at:
+            return dict(self._counts)
+        counts = await self.db.get_status_counts()
+        self._counts = counts
+        self._expires_at = time.monotonic() + self.ttl
+        return dict(counts)
+
+    def peek(self) -> Optional[Dict[str, int]]:
+        """返回内存中的计数（不检查有效期、不查询），尚未统计过时返回 None"""
+        return dict(self._counts) if self._counts is not None else None
+
+    def apply_transition(self, old_status: str, new_status: str, was_pending: bool):
+        """handle_response 更新单个卡片后同步调整计数"""
+        if self._counts is None:
+            return
+        if old_status != new_status:
+            self._counts[old_status] = max(self._counts.get(old_status, 0) - 1, 0)
+            self._counts[new_status] = self._counts.get(new_status, 0) + 1
+        if was_pending:
+            # 刚作答的卡片下次复习时间都在将来（或已不再复习），不再待复习
+            self._counts['pending_review'] = max(self._counts['pending_review'] - 1, 0)
+
+    def invalidate(self):
+        self._counts = None
+
+
+class WriteBehindQueue:
+    """user_words 的写回队列
+
+    请求路径只负责入队，后台任务把积压的更新按提交顺序合并成一次
+    bulk_write。写入失败会一直重试，保证更新不丢失、不乱序。
+    """
+
+    def __init__(self, collection, batch_size: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Dict[ObjectId, int] = {}  # word_id -> 尚未落库的更新数
+        self._flushed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = create_background_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                logger.warning('写回队列关闭超时，仍有 %d 条更新未落库', len(self._pending))
+            self._task = None
+
+    def submit(self, word_id: ObjectId, update: Dict):
+        self._pending[word_id] = self._pending.get(word_id, 0) + 1
+        self._queue.put_nowait((word_id, update))
+        if self._task is None:
+            # 未经 lifespan 启动（例如脚本中直接使用），按需启动后台任务
+            self.start()
+
+    def pending_ids(self) -> List[ObjectId]:
+        return list(self._pending)
+
+    async def wait_flushed(self, word_id: ObjectId):
+        """等待该单词积压的更新全部落库，读-改-写之前调用以免读到旧值"""
+        async with self._flushed:
+            await self._flushed.wait_for(lambda: word_id not in self._pending)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        operations = [UpdateOne({'_id': word_id}, update) for word_id, update in batch]
+        while operations:
+            try:
+                await self.collection.bulk_write(operations, ordered=True)
+                break
+            except BulkWriteError as e:
+                # 有序写入在第一个出错的操作处停止：它重试也不会成功，记录后丢弃；之后的操作尚未执行，继续写入
+                failed = e.details['writeErrors'][0]
+                logger.error('写回出错，已丢弃: %s %s', failed['op'], failed.get('errmsg'))
+                operations = operations[failed['index'] + 1:]
+            except PyMongoError as e:
+                logger.warning('写回失败，稍后重试: %s', e)
+                await asyncio.sleep(Config.WRITE_BEHIND_RETRY_DELAY)
+            except Exception as e:
+                # 非数据库错误（如无法编码的更新）重试也不会成功；丢弃剩余操作，后台任务继续运行，
+                # 否则 _pending 永远不清空，wait_flushed 会一直等待
+                logger.error('写回出错，已丢弃 %d 条: %s', len(operations), e, exc_info=True)
+                break
+        for word_id, _ in batch:
+            remaining = self._pending.get(word_id, 0) - 1
+            if remaining > 0:
+                self._pending[word_id] = remaining
+            else:
+                self._pending.pop(word_id, None)
+        async with self._flushed:
+            self._flushed.notify_all()
+
+
+class ClickLogBuffer:
+    """click_logs 的写入缓冲
+
+    评分请求只把事件放进有界队列，后台任务按条数或时间阈值用
+    insert_many(ordered=False) 批量写库；队列满时写入方等待，形成背压。
+    今日计数由 daily_counts 在作答时直接累加，不依赖日志是否已落库。
+    """
+
+    def __init__(self, collection, max_size: int, batch_size: int, flush_interval: float):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self.version = 0  # 每写入一批加一，学习分析据此判断缓存是否过期
+
+    def start(self):
+        if self._task is None:
+            self._task = create_background_task(self._run())
+
+    async def stop(self):
+        """关闭前写完所有缓冲的事件"""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+
+    async def add(self, event: Dict):
+        if self._task is None:
+            self.start()
+        await self._queue.put(event)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self._queue.get()
+            if event is None:
+                break
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict]):
+        while True:
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                self.version += 1
+                return
+            except BulkWriteError as e:
+                # 无序插入时其余文档已写入，只记录失败的部分
+                logger.error('点击日志部分写入失败: %s', e.details.get('writeErrors'))
+                self.version += 1
+                return
+            except PyMongoError as e:
+                logger.warning('点击日志写入失败，稍后重试: %s', e)
+                await asyncio.sleep(Config.WRITE_BEHIND_RETRY_DELAY)
+            except Exception as e:
+                # 无法编码的事件等非数据库错误重试也不会成功；丢弃这一批，后台任务必须继续运行，
+                # 否则队列写满后 add() 和 stop() 会永远等待
+                logger.error('点击日志写入出错，已丢弃 %d 条: %s', len(batch), e, exc_info=True)
+                return
+
+
+class SyllableDictionary:
+    """AllWords 音节数据的内存副本
+
+    源数据基本不变，启动时一次性读入 word -> syllables 字典，发卡时直接查表。
+    只保存非空的音节字符串，10 万词量级也只占几 MB。
+    未加载成功时 lookup 返回 None，由调用方回退到数据库查询。
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._syllables: Optional[Dict[str, str]] = None
+        self.loaded_at: Optional[datetime.datetime] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._syllables is not None
+
+    async def load(self) -> int:
+        """从数据库重新读取整个词典，读完后整体替换，加载期间旧词典照常提供查询"""
+        syllables = {}
+        cursor = self.collection.find(
+            {'syllables': {'$nin': [None, '']}}, {'_id': 0, 'word': 1, 'syllables': 1}
+        ).batch_size(Config.SYLLABLE_LOAD_BATCH_SIZE)
+        async for doc in cursor:
+            syllables[sys.intern(doc['word'])] = doc['syllables']
+        self._syllables = syllables
+        self.loaded_at = datetime.datetime.now()
+        return len(syllables)
+
+    def lookup(self, word: str) -> Optional[str]:
+        return self._syllables.get(word)
+
+
 class DatabaseManager:
     def __init__(self):
-        self.client = MongoClient(Config.DB_HOST)
+        self.client = AsyncMongoClient(Config.DB_HOST, event_listeners=[mongo_tracer])
         self.user_collection = self.client[Config.USER_DB_NAME][Config.USER_COLLECTION]
         self.log_collection = self.client[Config.USER_DB_NAME][Config.LOG_COLLECTION]
         self.mastered_collection = self.client[Config.MASTERED_DB_NAME][Config.MASTERED_COLLECTION]
         self.last_five_words_collection = self.client[Config.USER_DB_NAME][Config.LAST_FIVE_WORDS_COLLECTION]  # 新增
+        self.daily_counts_collection = self.client[Config.USER_DB_NAME][Config.DAILY_COUNTS_COLLECTION]
         # 连接源数据库和集合
-        self.source_db = self.client['LLMGenSentence']
+        self.source_db = self.client[Config.SOURCE_DB_NAME]
         self.source_collection = self.source_db['AllWords']
+        self.syllables = SyllableDictionary(self.source_collection)
+        self.counters = StatusCounterCache(self, Config.STATS_CACHE_TTL)
+        self.writer = WriteBehindQueue(self.user_collection, Config.WRITE_BEHIND_BATCH_SIZE)
+        self.click_logs = ClickLogBuffer(
+            self.log_collection, Config.CLICK_LOG_QUEUE_SIZE, Config.CLICK_LOG_BATCH_SIZE,
+            Config.CLICK_LOG_FLUSH_INTERVAL
+        )
 
-    def log_click_event(self, word_id, action):
-        current_time = datetime.datetime.now()  # 使用naive datetime
-        self.log_collection.insert_one({
-            'word_id': word_id,
-            'action': action,
-            'timestamp': current_time
-        })
-
-    def save_mastered_word(self, word: Dict):
+    def _index_specs(self):
+        """(集合, 索引键, 索引名, 是否唯一)：与各热点查询的过滤/排序字段一一对应"""
+        return [
+            (self.user_collection,
+             [('status', ASCENDING), ('next_review', ASCENDING), ('first_learn_date', ASCENDING)],
+             'status_next_review_first_learn_date', False),
+            (self.user_collection, [('status', ASCENDING)] + Config.NEW_WORD_ORDER,
+             'status_' + '_'.join(f'{field}_{direction}' for field, direction in Config.NEW_WORD_ORDER), False),
+            (self.user_collection, [('word', ASCENDING)], 'word', False),
+            (self.log_collection, [('word_id', ASCENDING)], 'word_id', False),
+            (self.log_collection, [('timestamp', ASCENDING)], 'timestamp', False),
+            (self.source_collection, [('word', ASCENDING)], 'word', False),
+            (self.mastered_collection, [('word', ASCENDING), ('phrase', ASCENDING)], 'word_phrase', False),
+            # 每个学习者每天只能有一个计数文档，并发的首次作答靠唯一索引避免插入两份
+            (self.daily_counts_collection, [('learner_id', ASCENDING), ('day', ASCENDING)], 'learner_id_day', True),
+        ]
+
+    def _obsolete_indexes(self):
+        """(集合, 索引名)：旧版本创建、已被其他索引覆盖的索引，启动时删除以免拖慢写入"""
+        return [
+            # status_next_review_first_learn_date 以它为前缀，查询同样可用
+            (self.user_collection, 'status_next_review'),
+        ]
+
+    def _hot_queries(self):
+        """(描述, 集合, 过滤条件, 排序)：启动时用 explain() 检查是否走索引"""
+        now = datetime.datetime.now()
+        return [
+            ('urgent_review', self.user_collection,
+             {'status': 'reviewing', 'next_review': {'$lte': now}}, [('next_review', DESCENDING)]),
+            ('urgent_review_today', self.user_collection,
+             {'status': 'reviewing', 'next_review': {'$lte': now},
+              'first_learn_date': {'$gte': now - datetime.timedelta(days=1), '$lte': now}},
+             [('next_review', DESCENDING)]),
+            ('new_word', self.user_collection, {'status': 'new'}, Config.NEW_WORD_ORDER),
+            ('mark_mastered', self.user_collection, {'word': ''}, None),
+            ('click_logs_by_word', self.log_collection, {'word_id': ObjectId()}, None),
+            ('syllables', self.source_collection, {'word': ''}, None),
+            ('mastered_upsert', self.mastered_collection, {'word': '', 'phrase': ''}, None),
+            ('daily_count', self.daily_counts_collection, {'learner_id': '', 'day': ''}, None),
+        ]
+
+    async def ensure_indexes(self):
+        """幂等地创建热点查询所需的索引，已存在时 create_index 不做任何事"""
+        for collection, keys, name, unique in self._index_specs():
+            try:
+                await self._create_index(collection, keys, name, unique)
+            except DuplicateKeyError:
+                logger.warning('%s 中已有重复数据，唯一索引 %s 未能创建，请先运行 数据处理/回填每日计数.py',
+                               collection.full_name, name)
+        for collection, name in self._obsolete_indexes():
+            if name in await collection.index_information():
+                logger.info('删除多余的索引 %s.%s', collection.full_name, name)
+                await collection.drop_index(name)
+
+    @staticmethod
+    async def _create_index(collection, keys, name: str, unique: bool):
+        try:
+            await collection.create_index(keys, name=name, unique=unique)
+        except DuplicateKeyError:
+            raise
+        except OperationFailure as e:
+            if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+                raise
+            # 旧版本创建的同名索引选项不同（如 learner_id_day 原先不唯一），删除后重建
+            logger.info('重建索引 %s.%s', collection.full_name, name)
+            await collection.drop_index(name)
+            await collection.create_index(keys, name=name, unique=unique)
+
+    async def verify_query_plans(self):
+        """对每个热点查询执行 explain()，出现全表扫描时打印警告"""
+        for label, collection, query, sort in self._hot_queries():
+            cursor = collection.find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.explain()).get('queryPlanner', {}).get('winningPlan', {})
+            if 'COLLSCAN' in _plan_stages(plan):
+                logger.warning('热点查询 %s 在 %s 上走了全表扫描', label, collection.full_name)
+
+    async def log_click_event(self, word_id, action, learner_id: str, new_words: int = 0):
+        await self.log_click_events([(word_id, action)], learner_id, new_words)
+
+    async def save_mastered_word(self, word: Dict):
         # 确保保存到 mastered_words 集合的单词状态为 mastered
         word_to_save = word.copy()
         word_to_save['status'] = 'mastered'
@@ -73,148 +783,467 @@ class DatabaseManager:
             'word': word_to_save['word'],
             'phrase': word_to_save['phrase'],
         }
-        print(unique_key)
-        result = self.mastered_collection.update_one(unique_key, {'$set': word_to_save}, upsert=True)
-        print(result)
+        await self.mastered_collection.update_one(unique_key, {'$set': word_to_save}, upsert=True)
+
+    async def log_click_events(self, events: List[tuple], learner_id: str, new_words: int = 0):
+        """批量记录点击事件，events 为 (word_id, action) 列表
+
+        同时累加当天的作答次数和首次学习的新词数（new_words）。
+        """
+        current_time = datetime.datetime.now()  # 使用naive datetime
+        bucket = {'learner_id': learner_id, 'day': learning_day(current_time)}
+        increments = {'$inc': {'count': len(events), 'new_count': new_words}}
+        try:
+            await self.daily_counts_collection.update_one(bucket, increments, upsert=True)
+        except DuplicateKeyError:
+            # 同一天的首次作答并发插入，另一个请求已建好当天的文档，重试即为累加
+            await self.daily_counts_collection.update_one(bucket, increments, upsert=True)
+        for word_id, action in events:
+            await self.click_logs.add({
+                'word_id': word_id,
+                'action': action,
+                'timestamp': current_time,
+                'learner_id': learner_id
+            })
+
+    async def mark_word_as_mastered(self, target_word: str):
+        # 先等待这些条目积压的写回更新落库，否则排在后面的复习状态会覆盖 mastered
+        if pending := self.writer.pending_ids():
+            queued = await self.user_collection.find(
+                {'_id': {'$in': pending}, 'word': target_word}, {'_id': 1}
+            ).to_list()
+            await asyncio.gather(*(self.writer.wait_flushed(word['_id']) for word in queued))
 
-    def mark_word_as_mastered(self, target_word: str):
         # 更新用户数据库中指定单词的所有条目的状态为 mastered
-        self.user_collection.update_many(
+        await self.user_collection.update_many(
             {'word': target_word},
             {'$set': {'status': 'mastered', 'next_review': None}}
         )
 
         # 同步到备份数据库
         words_to_sync = self.user_collection.find({'word': target_word})
-        for word in words_to_sync:
-            self.save_mastered_word(word)
-
-    def update_last_five_words(self, word: Dict):
-        # # 检查单词是否已存在
-        # existing_word = self.last_five_words_collection.find_one({'word': word['word']})
-        # if existing_word:
-        #     return
-
-        # 检查是否已有 15 个单词
-        count = self.last_five_words_collection.count_documents({})
-        if count >= Config.MAX_LAST_WORDS_COUNT:
-            # 删除最早的单词
-            oldest_word = self.last_five_words_collection.find_one(sort=[('order', ASCENDING)])
-            self.last_five_words_collection.delete_one({'_id': oldest_word['_id']})
-
-        # 获取最大的 order 值
-        max_order = self.last_five_words_collection.find_one(sort=[('order', DESCENDING)])
-        new_order = max_order['order'] + 1 if max_order else 1
-
-        # 插入新单词
-        self.last_five_words_collection.insert_one({
-            'word': word['word'],
-            'order': new_order
-        })
-
-    def get_last_five_words(self, current_word: str):
+        synced_ids = []
+        async for word in words_to_sync:
+            await self.save_mastered_word(word)
+            synced_ids.append(word['_id'])
+        self.counters.invalidate()
+        return synced_ids
+
+    async def update_last_five_words(self, word: Dict, learner_id: str):
+        await self.push_last_words([word['word']], learner_id)
+
+    async def push_last_words(self, words: List[str], learner_id: str):
+        """每个学习者一个文档，$push + $slice 原子地追加并截断到最近 15 个"""
+        await self.last_five_words_collection.update_one(
+            {'_id': learner_id},
+            {'$push': {'words': {'$each': words, '$slice': -Config.MAX_LAST_WORDS_COUNT}}},
+            upsert=True
+        )
+
+    async def get_last_five_words(self, current_word: str, learner_id: str):
         # 按order降序取最新的6个单词
-        recent_words = list(self.last_five_words_collection.find()
-                            .sort('order', DESCENDING)
-                            .limit(6))  # 取最新的6个
+        recent_words = await self.get_recent_words(learner_id, 6)  # 取最新的6个
 
         # 提取单词列表并过滤当前单词
-        filtered_words = [word['word'] for word in recent_words if word['word'] != current_word]
+        filtered_words = [word for word in recent_words if word != current_word]
 
         # 确保最多返回5个单词
         return filtered_words[:5]
 
-    def mark_word_as_bad(self, word_id: ObjectId):
+    async def get_recent_words(self, learner_id: str, limit: int) -> List[str]:
+        """最近学习的单词，从新到旧"""
+        doc = await self.last_five_words_collection.find_one({'_id': learner_id}, {'words': 1})
+        words = doc['words'] if doc else []
+        return words[::-1][:limit]
+
+    async def mark_word_as_bad(self, word_id: ObjectId):
+        # 等待积压的写回更新落库，避免之后写入的复习状态覆盖【不好】
+        await self.writer.wait_flushed(word_id)
         # 将指定单词的状态标注为【不好】
-        self.user_collection.update_one(
+        await self.user_collection.update_one(
             {'_id': word_id},
             {'$set': {'status': 'bad', 'next_review': None}}
         )
+        self.counters.invalidate()
 
-    def get_today_learning_count(self):
-        utc_offset = datetime.timedelta(hours=8)
-        today_start = datetime.datetime.utcnow() + utc_offset
-        today_start = datetime.datetime(today_start.year, today_start.month, today_start.day, 0, 0, 0)
-        today_end = datetime.datetime(today_start.year, today_start.month, today_start.day, 23, 59, 59)
-        today_logs_query = {
-            "timestamp": {
-                "$gte": today_start,
-                "$lte": today_end
-            }
-        }
-        return self.log_collection.count_documents(today_logs_query)
+    async def get_today_learning_count(self, learner_id: str):
+        bucket = await self.daily_counts_collection.find_one(
+            {'learner_id': learner_id, 'day': learning_day(datetime.datetime.now())}
+        )
+        return bucket['count'] if bucket else 0
+
+    async def get_today_new_count(self, learner_id: str):
+        """今天已开始学习的新词数"""
+        bucket = await self.daily_counts_collection.find_one(
+            {'learner_id': learner_id, 'day': learning_day(datetime.datetime.now())}, {'new_count': 1}
+        )
+        return bucket.get('new_count', 0) if bucket else 0
 
-    def get_syllables(self, word):
-        doc = self.source_collection.find_one({'word': word})
+    async def get_syllables(self, word):
+        if self.syllables.loaded:
+            return self.syllables.lookup(word)
+        doc = await self.source_collection.find_one({'word': word})
         return doc.get('syllables') if doc else None
 
-    def get_pending_review_count(self):
-        """获取待复习的旧词数量"""
+    async def get_syllables_many(self, words: List[str]) -> Dict[str, Optional[str]]:
+        if self.syllables.loaded:
+            return {word: self.syllables.lookup(word) for word in words}
+        docs = await self.source_collection.find({'word': {'$in': words}}, {'word': 1, 'syllables': 1}).to_list()
+        return {doc['word']: doc.get('syllables') for doc in docs}
+
+    async def get_upcoming_words(self, exclude_id, limit: int) -> List[Dict]:
+        """预估接下来可能出现的卡片：先取已到期的复习词，不足时补新词"""
+        projection = {'word': 1, 'phrase': 1, 'cn_word_meaning': 1, 'V2_examples': 1}
         current_time = datetime.datetime.now()  # 使用naive datetime
-        return self.user_collection.count_documents(
-            {'status': 'reviewing', 'next_review': {'$lte': current_time}}
-        )
+        words = await self.user_collection.find(
+            {'status': 'reviewing', 'next_review': {'$lte': current_time}, '_id': {'$ne': exclude_id}},
+            projection
+        ).sort('next_review', DESCENDING).limit(limit).to_list()
+        if len(words) < limit:
+            words += await self.user_collection.find(
+                {'status': 'new', '_id': {'$ne': exclude_id}}, projection
+            ).sort(Config.NEW_WORD_ORDER).limit(limit - len(words)).to_list()
+        return words
+
+    async def get_interval_distribution(self) -> List[Dict]:
+        """复习中卡片按当前间隔分组的数量，在服务端聚合"""
+        cursor = await self.user_collection.aggregate([
+            {'$match': {'status': 'reviewing'}},
+            {'$group': {'_id': '$interval', 'cards': {'$sum': 1}}},
+            {'$sort': {'_id': 1}},
+        ])
+        return [{'interval_seconds': row['_id'], 'cards': row['cards']} async for row in cursor]
+
+    async def get_status_counts(self) -> Dict[str, int]:
+        """一次聚合同时统计各状态数量与待复习数量"""
+        current_time = datetime.datetime.now()  # 使用naive datetime
+        cursor = await self.user_collection.aggregate([
+            {'$facet': {
+                'by_status': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+                'pending_review': [
+                    {'$match': {'status': 'reviewing', 'next_review': {'$lte': current_time}}},
+                    {'$count': 'count'}
+                ],
+            }}
+        ])
+        result = (await cursor.to_list())[0]
+        counts = {'mastered': 0, 'reviewing': 0, 'new': 0}
+        counts.update({row['_id']: row['count'] for row in result['by_status'] if row['_id']})
+        counts['pending_review'] = result['pending_review'][0]['count'] if result['pending_review'] else 0
+        return counts
+
+
+# ====================== 复习调度模块 ======================
+class ReviewScheduler:
+    """在内存中维护 reviewing 卡片到期顺序的调度器
+
+    未到期的卡片放在按 next_review 排序的最小堆里，到期后移入最大堆，
+    取词时与原先 `sort next_review DESC` 的查询结果一致。今天首次学习的
+    到期卡片另有一个最大堆，供 new_today_only 模式使用。卡片更新后旧的
+    堆条目靠版本号惰性淘汰，所有操作都是 O(log n)。
+    """
+    PROJECTION = {'next_review': 1, 'first_learn_date': 1}
 
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.ready = False
+        self._reset()
+
+    def _reset(self):
+        self._cards: Dict[ObjectId, tuple] = {}  # word_id -> (next_review, first_learn_date, version)
+        self._future: List[tuple] = []  # (next_review, version, word_id)
+        self._due: List[tuple] = []  # (-时间戳, version, word_id)
+        self._due_today: List[tuple] = []
+        self._today: Optional[tuple] = None
+        self._version = 0
+        self._promoted = set()  # 当前已到期的卡片，数量即待复习数
+
+    async def load(self):
+        """从 MongoDB 重建调度状态，服务启动时调用"""
+        docs = await self.db.user_collection.find(
+            {'status': 'reviewing', 'next_review': {'$ne': None}}, self.PROJECTION
+        ).to_list()
+        self._reset()
+        for doc in docs:
+            self._version += 1
+            self._cards[doc['_id']] = (doc['next_review'], doc.get('first_learn_date'), self._version)
+            self._future.append((doc['next_review'], self._version, doc['_id']))
+        heapq.heapify(self._future)
+        self.ready = True
+        logger.info('复习调度器已加载 %d 张卡片', len(self._cards))
+
+    def schedule(self, word_id: ObjectId, next_review: datetime.datetime,
+                 first_learn_date: Optional[datetime.datetime]):
+        self._version += 1
+        self._promoted.discard(word_id)
+        self._cards[word_id] = (next_review, first_learn_date, self._version)
+        heapq.heappush(self._future, (next_review, self._version, word_id))
+
+    def discard(self, word_id: ObjectId):
+        self._cards.pop(word_id, None)
+        self._promoted.discard(word_id)
+
+    def pending_count(self, current_time: datetime.datetime) -> int:
+        """已到期待复习的卡片数，不查询数据库"""
+        self._promote(current_time)
+        return len(self._promoted)
+
+    def next_due_time(self) -> Optional[datetime.datetime]:
+        """下一张卡片到期的时间"""
+        while self._future and not self._is_current(self._future[0][2], self._future[0][1]):
+            heapq.heappop(self._future)
+        return self._future[0][0] if self._future else None
+
+    def peek_due(self, review_mode: str, current_time: datetime.datetime) -> Optional[ObjectId]:
+        """返回当前应复习的卡片（不出堆，作答后由 schedule/discard 更新）"""
+        self._promote(current_time)
+        heap = self._due_today if review_mode == 'new_today_only' else self._due
+        while heap:
+            _, version, word_id = heap[0]
+            if self._is_current(word_id, version):
+                return word_id
+            heapq.heappop(heap)
+        return None
+
+    def peek_due_many(self, review_mode: str, current_time: datetime.datetime, limit: int) -> List[ObjectId]:
+        """按出卡顺序返回前 limit 张到期卡片，O(limit * log n)"""
+        self._promote(current_time)
+        heap = self._due_today if review_mode == 'new_today_only' else self._due
+        taken = []
+        while heap and len(taken) < limit:
+            entry = heapq.heappop(heap)
+            if self._is_current(entry[2], entry[1]):
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return [entry[2] for entry in taken]
+
+    def _is_current(self, word_id: ObjectId, version: int) -> bool:
+        card = self._cards.get(word_id)
+        return card is not None and card[2] == version
+
+    def _learned_today(self, first_learn_date: Optional[datetime.datetime]) -> bool:
+        return first_learn_date is not None and self._today[0] <= first_learn_date <= self._today[1]
+
+    def _refresh_today(self):
+        today = today_range()
+        if today == self._today:
+            return
+        # 跨天后重建“今天首次学习”的到期堆
+        self._today = today
+        self._due_today = [
+            entry for entry in self._due
+            if self._is_current(entry[2], entry[1]) and self._learned_today(self._cards[entry[2]][1])
+        ]
+        heapq.heapify(self._due_today)
+
+    def _promote(self, current_time: datetime.datetime):
+        # 先确定“今天”的范围，_learned_today 依赖它
+        self._refresh_today()
+        while self._future and self._future[0][0] <= current_time:
+            next_review, version, word_id = heapq.heappop(self._future)
+            if not self._is_current(word_id, version):
+                continue
+            entry = (-next_review.timestamp(), version, word_id)
+            heapq.heappush(self._due, entry)
+            self._promoted.add(word_id)
+            if self._learned_today(self._cards[word_id][1]):
+                heapq.heappush(self._due_today, entry)
+
+
+class NewWordQueue:
+    """按 Config.NEW_WORD_ORDER 排好序的新词队列
+
+    启动时一次性取出所有新词的 _id，之后用游标依次出词。单词开始学习后
+    由 discard 标记移除，游标跳过队首已移除的单词，均摊 O(1)。
+    服务运行期间新导入的单词排在队列之外，队列取完后再从数据库补充。
+    """
 
-# ====================== 学习系统模块 ======================
-class LearningSystem:
     def __init__(self, db: DatabaseManager):
         self.db = db
-        self.current_word: Optional[Dict] = None
+        self.ready = False
+        self._ids: List[ObjectId] = []
+        self._cursor = 0
+        self._removed = set()
+
+    async def load(self):
+        docs = await self.db.user_collection.find(
+            {'status': 'new'}, {'_id': 1}
+        ).sort(Config.NEW_WORD_ORDER).to_list()
+        self._ids = [doc['_id'] for doc in docs]
+        self._cursor = 0
+        self._removed = set()
+        self.ready = True
+        logger.info('新词队列已加载 %d 个单词', len(self._ids))
+
+    def peek(self, limit: int) -> List[ObjectId]:
+        """按顺序返回接下来的 limit 个新词，不移动游标（作答后由 discard 推进）"""
+        taken = []
+        index = self._cursor
+        while index < len(self._ids) and len(taken) < limit:
+            if self._ids[index] not in self._removed:
+                taken.append(self._ids[index])
+            index += 1
+        return taken
+
+    def discard(self, word_id: ObjectId):
+        self._removed.add(word_id)
+        while self._cursor < len(self._ids) and self._ids[self._cursor] in self._removed:
+            self._removed.discard(self._ids[self._cursor])
+            self._cursor += 1
+
 
-    def get_next_word(self, review_mode: str) -> Optional[Dict]:
-        global stage
-        random_num = random.randint(0, 1)
+# ====================== 学习系统模块 ======================
+# 出卡查询只取 _format_word 和调度器需要的字段，不读取文档中其余的例句等大字段
+CARD_PROJECTION = {
+    'word': 1, 'phrase': 1, 'cn_word_meaning': 1, 'phrase_meaning': 1, 'line_number': 1,
+    'V2_examples.text': 1, 'V2_examples.translation': 1, 'status': 1, 'reviews': 1, 'wins': 1,
+    'number': 1, 'consecutive_remember_count': 1, 'first_learn_date': 1,
+}
+
+
+class LearningSystem:
+    def __init__(self, db: DatabaseManager, scheduler: ReviewScheduler, new_words: NewWordQueue):
+        self.db = db
+        self.scheduler = scheduler
+        self.new_words = new_words
 
+    async def get_next_word(self, review_mode: str, learner_id: str) -> Optional[Dict]:
         current_time = datetime.datetime.now()  # 使用naive datetime
-        # 统计待复习的新词和旧词数量
-        new_words_count = self.db.user_collection.count_documents({'status': 'new'})
-        reviewing_words_count = self.db.get_pending_review_count()
-        print(f"待学习的新词数量: {new_words_count}，待复习的旧词数量: {reviewing_words_count}")
 
         if review_mode == "old_mode":
-            print('1111111111111111111111111111111111')
-            if word := self._get_urgent_review(current_time):
-                self.current_word = word
-            elif word := self._get_new_word():
-                self.current_word = word
-            else:
+            if not (word := await self._get_urgent_review(current_time) or await self._get_new_word(learner_id)):
                 return None
         elif review_mode == "new_today_only":
-            print(22222222222222222222222222222222222222)
-            if word := self._get_urgent_review_today(current_time):
-                self.current_word = word
-            elif word := self._get_new_word():
-                self.current_word = word
-            else:
+            if not (word := await self._get_urgent_review_today(current_time)
+                    or await self._get_new_word(learner_id)):
                 return None
         else:
             raise HTTPException(status_code=400, detail="Invalid review mode")
 
-        formatted_word = self._format_word(self.current_word)
-        last_five_words = self.db.get_last_five_words(self.current_word['word'])
-        formatted_word['last_five_words'] = last_five_words
+        # 彼此独立的查询并发执行，耗时取决于最慢的一个而不是总和
+        formatted_word, last_five_words, today_learning_count, syllables, counts = await asyncio.gather(
+            self._format_word(word),
+            self.db.get_last_five_words(word['word'], learner_id),
+            self.db.get_today_learning_count(learner_id),
+            self.db.get_syllables(word['word']),
+            self.db.counters.get(),
+        )
+        # 统计待复习的新词和旧词数量
+        logger.debug('待学习的新词数量: %d，待复习的旧词数量: %d', counts['new'], counts['pending_review'])
 
+        formatted_word['last_five_words'] = last_five_words
         # 获取今日学习的总计数
-        today_learning_count = self.db.get_today_learning_count()
         formatted_word['today_learning_count'] = today_learning_count
-
         # 获取音节信息
-        formatted_word['syllables'] = self.db.get_syllables(self.current_word['word'])
-
+        formatted_word['syllables'] = syllables
         # 获取待复习的旧词数量
-        formatted_word['pending_review_count'] = reviewing_words_count
+        formatted_word['pending_review_count'] = counts['pending_review']
 
         return formatted_word
 
-    def handle_response(self, response: str) -> Dict:
-        if not self.current_word:
-            raise HTTPException(status_code=400, detail="No current word")
+    async def get_next_words(self, review_mode: str, learner_id: str, limit: int) -> List[Dict]:
+        """一次取出接下来的 limit 张卡片，顺序与连续调用 get_next_word 并依次作答一致"""
+        if review_mode not in ("old_mode", "new_today_only"):
+            raise HTTPException(status_code=400, detail="Invalid review mode")
 
-        # 每次提交响应后更新最近学习的单词
-        self.db.update_last_five_words(self.current_word)
+        current_time = datetime.datetime.now()  # 使用naive datetime
+        words = await self._get_urgent_reviews(review_mode, current_time, limit)
+        due_count = len(words)
+        if len(words) < limit:
+            words += await self._get_new_words(min(limit - len(words), await self._new_word_budget(learner_id)))
+        if not words:
+            return []
+
+        formatted_words, recent_words, today_learning_count, syllables, counts = await asyncio.gather(
+            asyncio.gather(*(self._format_word(word) for word in words)),
+            self.db.get_recent_words(learner_id, limit + 5),
+            self.db.get_today_learning_count(learner_id),
+            self.db.get_syllables_many([word['word'] for word in words]),
+            self.db.counters.get(),
+        )
 
+        for index, formatted_word in enumerate(formatted_words):
+            # 批次中排在前面的卡片在用户看到这一张时已经学完
+            history = [word['word'] for word in reversed(words[:index])] + recent_words
+            formatted_word['last_five_words'] = [w for w in history if w != formatted_word['word']][:5]
+            formatted_word['today_learning_count'] = today_learning_count + index
+            formatted_word['syllables'] = syllables.get(formatted_word['word'])
+            formatted_word['pending_review_count'] = max(counts['pending_review'] - min(index, due_count), 0)
+        return formatted_words
+
+    async def handle_response(self, word_id: ObjectId, response: str, learner_id: str) -> Dict:
         current_time = datetime.datetime.now()  # 使用naive datetime
+        self._get_response_handler(response)
+
+        # 按提交的 word_id 评分，不依赖进程内记录的“当前单词”
+        await self.db.writer.wait_flushed(word_id)
+        word = await self.db.user_collection.find_one({'_id': word_id})
+        if not word:
+            raise HTTPException(status_code=404, detail="Word not found")
+
+        history = None if 'wins' in word else await self._count_outcomes(word_id)
+        update_data, increments = self._grade(word, response, current_time, history)
+
+        # 每次提交响应后更新最近学习的单词，并与点击日志、标熟备份并发写入
+        writes = [
+            self.db.update_last_five_words(word, learner_id),
+            self.db.log_click_event(word_id, response, learner_id, int(word['status'] == 'new')),
+        ]
+        if update_data['status'] == 'mastered':
+            writes.append(self.db.save_mastered_word(word))  # 保存标熟数据
+        await asyncio.gather(*writes)
+
+        await self._update_word(word_id, update_data, increments)
+        self._apply_to_memory(word, update_data, current_time)
+
+        return {"status": "complete"}
+
+    async def handle_responses(self, responses: List[tuple], learner_id: str) -> int:
+        """按提交顺序批量评分，responses 为 (word_id, action) 列表
+
+        语义与逐条调用 handle_response 相同：同一单词多次出现时，后一次基于前一次
+        的结果计算间隔。所有单词更新合并为一次有序 bulk_write。
+        """
+        for _, response in responses:
+            self._get_response_handler(response)
+
+        word_ids = list(dict.fromkeys(word_id for word_id, _ in responses))
+        await asyncio.gather(*(self.db.writer.wait_flushed(word_id) for word_id in word_ids))
+        words = {word['_id']: word for word in
+                 await self.db.user_collection.find({'_id': {'$in': word_ids}}).to_list()}
+        if missing := [str(word_id) for word_id in word_ids if word_id not in words]:
+            raise HTTPException(status_code=404, detail=f"Word not found: {', '.join(missing)}")
+        unmigrated = [word_id for word_id in word_ids if 'wins' not in words[word_id]]
+        histories = dict(zip(unmigrated, await asyncio.gather(*(self._count_outcomes(i) for i in unmigrated))))
+
+        operations, graded, mastered = [], [], []
+        new_words = 0
+        for word_id, response in responses:
+            current_time = datetime.datetime.now()  # 使用naive datetime
+            word = words[word_id]
+            new_words += word['status'] == 'new'
+            history = None if 'wins' in word else histories[word_id]
+            update_data, increments = self._grade(word, response, current_time, history)
+            operations.append(UpdateOne({'_id': word_id}, {'$set': update_data, '$inc': increments}))
+            graded.append((word, update_data, current_time))
+            if update_data['status'] == 'mastered':
+                mastered.append(word)
+            # 后续同一单词的评分基于本次结果
+            words[word_id] = {**word, **update_data,
+                              **{field: word.get(field, 0) + n for field, n in increments.items()}}
+
+        await self.db.user_collection.bulk_write(operations, ordered=True)
+        await asyncio.gather(
+            self.db.log_click_events(responses, learner_id, new_words),
+            self.db.push_last_words([word['word'] for word, _, _ in graded], learner_id),
+            *(self.db.save_mastered_word(word) for word in mastered),
+        )
+        for word, update_data, current_time in graded:
+            self._apply_to_memory(word, update_data, current_time)
+        return len(responses)
+
+    def _get_response_handler(self, response: str):
         handler = {
             'remember': self._handle_remember,
             'forget': self._handle_forget,
@@ -223,53 +1252,149 @@ class LearningSystem:
 
         if not handler:
             raise HTTPException(status_code=400, detail="Invalid response")
+        return handler
+
+    def _grade(self, word: Dict, response: str, current_time: datetime.datetime,
+               history: Optional[Dict[str, int]] = None):
+        """计算一次作答对应的字段更新，返回 (update_data, $inc 的字段)
 
-        self.db.log_click_event(self.current_word['_id'], response)
-        update_data = handler(self.current_word, current_time)
+        history 为尚未回填胜负计数的旧卡片从日志统计出的 {'wins', 'losses'}。
+        """
+        update_data = self._get_response_handler(response)(word, current_time)
 
         # 记录首次学习日期
-        if 'first_learn_date' not in self.current_word:
+        if 'first_learn_date' not in word:
             update_data['first_learn_date'] = current_time
 
         # 更新连续正确次数
         if response == 'remember':
-            consecutive_count = self.current_word.get('consecutive_remember_count', 0) + 1
+            consecutive_count = word.get('consecutive_remember_count', 0) + 1
             update_data['consecutive_remember_count'] = consecutive_count
             if consecutive_count == 20:
                 update_data['status'] = 'mastered'
-                self.db.save_mastered_word(self.current_word)
         else:
             update_data['consecutive_remember_count'] = 0
 
-        self._update_word(self.current_word['_id'], update_data)
-
-        return {"status": "complete"}
-
-    def _get_urgent_review(self, current_time: datetime.datetime) -> Optional[Dict]:
-        print(self.db.user_collection.find_one(
-            {'status': 'reviewing', 'next_review': {'$lte': current_time}},
-            sort=[('next_review', DESCENDING)]
-        ))
+        # 胜负计数与 reviews 一起原子递增，win_rate 无需再扫描 click_logs
+        outcome = 'wins' if response in ('remember', 'master') else 'losses'
+        if history is None:
+            return update_data, {'reviews': 1, outcome: 1}
+        # 未经回填迁移的旧卡片：历史胜负连同本次结果一次写入，之后即可直接累加
+        update_data['wins'] = history['wins'] + (outcome == 'wins')
+        update_data['losses'] = history['losses'] + (outcome == 'losses')
+        return update_data, {'reviews': 1}
+
+    def _apply_to_memory(self, word: Dict, update_data: Dict, current_time: datetime.datetime):
+        # 调度器立即生效，数据库由写回队列异步落库
+        if word['status'] == 'new':
+            self.new_words.discard(word['_id'])
+        if update_data['status'] == 'reviewing':
+            self.scheduler.schedule(
+                word['_id'],
+                update_data['next_review'],
+                update_data.get('first_learn_date', word.get('first_learn_date'))
+            )
+        else:
+            self.scheduler.discard(word['_id'])
+        self.db.counters.apply_transition(
+            word['status'],
+            update_data['status'],
+            word['status'] == 'reviewing' and word.get('next_review') is not None
+            and word['next_review'] <= current_time
+        )
 
-        return self.db.user_collection.find_one(
-            {'status': 'reviewing', 'next_review': {'$lte': current_time}},
+    def _due_query(self, current_time: datetime.datetime) -> Dict:
+        """未加载调度器时查询到期卡片的条件，跳过作答后尚未写回的单词"""
+        query = {'status': 'reviewing', 'next_review': {'$lte': current_time}}
+        if pending_ids := self.db.writer.pending_ids():
+            query['_id'] = {'$nin': pending_ids}
+        return query
+
+    async def _get_urgent_review(self, current_time: datetime.datetime) -> Optional[Dict]:
+        if self.scheduler.ready:
+            return await self._get_scheduled_review('old_mode', current_time)
+        return await self.db.user_collection.find_one(
+            self._due_query(current_time),
+            CARD_PROJECTION,
             sort=[('next_review', DESCENDING)]
         )
 
-    def _get_urgent_review_today(self, current_time: datetime.datetime) -> Optional[Dict]:
-        utc_offset = datetime.timedelta(hours=8)
-        today_start = datetime.datetime.utcnow() + utc_offset
-        today_start = datetime.datetime(today_start.year, today_start.month, today_start.day, 0, 0, 0)
-        today_end = datetime.datetime(today_start.year, today_start.month, today_start.day, 23, 59, 59)
-        return self.db.user_collection.find_one(
-            {'status': 'reviewing', 'next_review': {'$lte': current_time},
-             'first_learn_date': {'$gte': today_start, '$lte': today_end}},
+    async def _get_urgent_review_today(self, current_time: datetime.datetime) -> Optional[Dict]:
+        if self.scheduler.ready:
+            return await self._get_scheduled_review('new_today_only', current_time)
+        today_start, today_end = today_range()
+        return await self.db.user_collection.find_one(
+            {**self._due_query(current_time), 'first_learn_date': {'$gte': today_start, '$lte': today_end}},
+            CARD_PROJECTION,
             sort=[('next_review', DESCENDING)]
         )
 
-    def _get_new_word(self) -> Optional[Dict]:
-        # 每次都查询数据库，取第一个状态为 'new' 的单词
-        return self.db.user_collection.find_one({'status': 'new'})
+    async def _get_scheduled_review(self, review_mode: str, current_time: datetime.datetime) -> Optional[Dict]:
+        while word_id := self.scheduler.peek_due(review_mode, current_time):
+            if word := await self.db.user_collection.find_one({'_id': word_id, 'status': 'reviewing'},
+                                                              CARD_PROJECTION):
+                return word
+            # 卡片在调度器之外被修改（如手动改库），丢弃后继续取下一张
+            self.scheduler.discard(word_id)
+        return None
+
+    async def _get_urgent_reviews(self, review_mode: str, current_time: datetime.datetime,
+                                  limit: int) -> List[Dict]:
+        """按出卡顺序取前 limit 张到期的复习卡片"""
+        if self.scheduler.ready:
+            word_ids = self.scheduler.peek_due_many(review_mode, current_time, limit)
+            words = {word['_id']: word for word in await self.db.user_collection.find(
+                {'_id': {'$in': word_ids}, 'status': 'reviewing'}, CARD_PROJECTION).to_list()}
+            for word_id in word_ids:
+                if word_id not in words:
+                    self.scheduler.discard(word_id)
+            return [words[word_id] for word_id in word_ids if word_id in words]
+
+        query = self._due_query(current_time)
+        if review_mode == 'new_today_only':
+            today_start, today_end = today_range()
+            query['first_learn_date'] = {'$gte': today_start, '$lte': today_end}
+        return await (self.db.user_collection.find(query, CARD_PROJECTION)
+                      .sort('next_review', DESCENDING).limit(limit).to_list())
+
+    async def _new_word_budget(self, learner_id: str) -> int:
+        """今天还能开始学习的新词数"""
+        if not Config.DAILY_NEW_WORD_LIMIT:
+            return Config.MAX_BATCH_SIZE
+        return max(Config.DAILY_NEW_WORD_LIMIT - await self.db.get_today_new_count(learner_id), 0)
+
+    async def _get_new_word(self, learner_id: str) -> Optional[Dict]:
+        # 当天的新词额度用完后只出复习卡片
+        if not await self._new_word_budget(learner_id):
+            return None
+        words = await self._get_new_words(1)
+        return words[0] if words else None
+
+    async def _get_new_words(self, limit: int) -> List[Dict]:
+        """按新词队列的顺序取接下来的 limit 个新词"""
+        if limit <= 0:
+            return []
+        words = []
+        if self.new_words.ready:
+            while word_ids := self.new_words.peek(limit):
+                found = {word['_id']: word for word in await self.db.user_collection.find(
+                    {'_id': {'$in': word_ids}, 'status': 'new'}, CARD_PROJECTION).to_list()}
+                # 在队列之外被修改（标熟、标记为不好等）的单词丢弃后重新取
+                for word_id in word_ids:
+                    if word_id not in found:
+                        self.new_words.discard(word_id)
+                if len(found) == len(word_ids):
+                    words = [found[word_id] for word_id in word_ids]
+                    break
+            if len(words) == limit:
+                return words
+
+        # 队列未加载或已取完（服务运行期间导入了新词）时查询数据库；跳过作答后尚未写回的单词
+        query = {'status': 'new'}
+        if exclude_ids := self.db.writer.pending_ids() + [word['_id'] for word in words]:
+            query['_id'] = {'$nin': exclude_ids}
+        return words + await (self.db.user_collection.find(query, CARD_PROJECTION)
+                              .sort(Config.NEW_WORD_ORDER).limit(limit - len(words)).to_list())
 
     def _handle_remember(self, word: Dict, current_time: datetime.datetime) -> Dict:
         new_interval = word['interval'] * 2
@@ -287,18 +1412,20 @@ class LearningSystem:
         }
 
     def _handle_master(self, word: Dict, current_time: datetime.datetime) -> Dict:
-        self.db.save_mastered_word(word)  # 保存标熟数据
         return {'status': 'mastered', 'next_review': None}
 
-    def _update_word(self, word_id: ObjectId, update_data: Dict):
-        self.db.user_collection.update_one(
-            {'_id': word_id},
-            {'$set': update_data, '$inc': {'reviews': 1}}
-        )
+    async def _update_word(self, word_id: ObjectId, update_data: Dict, increments: Dict[str, int]):
+        update = {'$set': update_data, '$inc': increments}
+        if Config.STATELESS:
+            # 写回队列和 wait_flushed 只在本进程内有效，无状态模式直接落库，其他进程才能读到最新状态
+            await self.db.user_collection.update_one({'_id': word_id}, update)
+        else:
+            self.db.writer.submit(word_id, update)
 
-    def _format_word(self, word: Dict) -> Dict:
+    async def _format_word(self, word: Dict) -> Dict:
         reviews = word.get("reviews", 0)
-        wins = self._calculate_wins(word["_id"])
+        # 未经回填迁移的旧文档没有 wins 字段，退回扫描日志
+        wins = word["wins"] if "wins" in word else (await self._count_outcomes(word["_id"]))['wins']
         win_rate = wins / reviews if reviews > 0 else 0
 
         # # 判断使用哪个例句列表
@@ -328,18 +1455,911 @@ class LearningSystem:
             "pending_review_count": 0  # 先置空，后续在 get_next_word 中填充
         }
 
-    def _calculate_wins(self, word_id):
-        logs = self.db.log_collection.find({'word_id': word_id})
-        wins = 0
-        for log in logs:
-            if log['action'] in ['remember', 'master']:
-                wins += 1
-        return wins
+    async def _count_outcomes(self, word_id) -> Dict[str, int]:
+        """从点击日志统计胜负次数，只用于尚未回填 wins/losses 的旧卡片"""
+        logs = self.db.log_collection.find({'word_id': word_id}, {'action': 1})
+        counts = {'wins': 0, 'losses': 0}
+        async for log in logs:
+            counts['wins' if log['action'] in ['remember', 'master'] else 'losses'] += 1
+        return counts
+
+
+# ====================== 学习分析模块 ======================
+ACTION_CODES = {'remember': 0, 'forget': 1, 'master': 2}
+FORGET = ACTION_CODES['forget']
+# 距上次作答的时间分桶上界（秒）：5 分钟、15 分钟、1 小时、4 小时、12 小时、1 天、3 天、7 天、30 天，最后一桶不设上界
+RETENTION_BUCKETS = np.array([300, 900, 3600, 4 * 3600, 12 * 3600, 86400, 3 * 86400, 7 * 86400, 30 * 86400])
+MAX_DOUBLINGS = 20  # 间隔翻倍次数的统计上限
+
+
+class LogColumns:
+    """一个学习者全部点击日志的列式副本，按 _id 增量追加"""
+
+    def __init__(self):
+        self.word_ids: List[ObjectId] = []  # 列中的单词下标 -> word_id
+        self._word_index: Dict[ObjectId, int] = {}
+        self.word = np.empty(0, dtype=np.int32)
+        self.action = np.empty(0, dtype=np.int8)
+        self.timestamp = np.empty(0, dtype=np.float64)  # epoch 秒
+        self.last_id: Optional[ObjectId] = None
+        self.loaded_at = time.monotonic()
+        self.version = -1  # 对应 ClickLogBuffer.version
+
+    def extend(self, logs: List[Dict]):
+        if not logs:
+            return
+        words = np.fromiter((self._index(log['word_id']) for log in logs), dtype=np.int32, count=len(logs))
+        actions = np.fromiter((ACTION_CODES.get(log['action'], -1) for log in logs), dtype=np.int8, count=len(logs))
+        # 日志时间是服务器本地 naive 时间，timestamp() 按本地时区换算成 epoch
+        timestamps = np.fromiter((log['timestamp'].timestamp() for log in logs), dtype=np.float64, count=len(logs))
+        self.word = np.concatenate((self.word, words))
+        self.action = np.concatenate((self.action, actions))
+        self.timestamp = np.concatenate((self.timestamp, timestamps))
+        newest = max(log['_id'] for log in logs)
+        if self.last_id is None or newest > self.last_id:
+            self.last_id = newest
+
+    def _index(self, word_id: ObjectId) -> int:
+        index = self._word_index.get(word_id)
+        if index is None:
+            index = self._word_index[word_id] = len(self.word_ids)
+            self.word_ids.append(word_id)
+        return index
+
+
+def compute_analytics(columns: LogColumns, days: int, now: float, utc_offset: float) -> Dict:
+    """在列数组上一次性计算各项指标，不逐条遍历日志
+
+    utc_offset 为学习者时区当前的 UTC 偏移（秒），用于按学习者的日期划分每日直方图。
+    """
+    # 按 (单词, 时间) 排序，同一单词的相邻两行即前后两次作答
+    order = np.lexsort((columns.timestamp, columns.word))
+    word = columns.word[order]
+    action = columns.action[order]
+    timestamp = columns.timestamp[order]
+    is_forget = action == FORGET
+    is_remember = action == ACTION_CODES['remember']
+
+    same_word = np.zeros(len(word), dtype=bool)
+    same_word[1:] = word[1:] == word[:-1]
+
+    # 保持曲线：按距上次作答的时长分桶，统计本次仍记得（非 forget）的比例
+    elapsed = np.diff(timestamp, prepend=timestamp[:1])[same_word]
+    recalled = ~is_forget[same_word]
+    bucket = np.searchsorted(RETENTION_BUCKETS, elapsed, side='left')
+    bucket_reviews = np.bincount(bucket, minlength=len(RETENTION_BUCKETS) + 1)
+    bucket_recalls = np.bincount(bucket, weights=recalled, minlength=len(RETENTION_BUCKETS) + 1)
+    retention_curve = [
+        {
+            'elapsed_max_seconds': int(RETENTION_BUCKETS[i]) if i < len(RETENTION_BUCKETS) else None,
+            'reviews': int(bucket_reviews[i]),
+            'recall_rate': float(bucket_recalls[i] / bucket_reviews[i]) if bucket_reviews[i] else None,
+        }
+        for i in range(len(RETENTION_BUCKETS) + 1)
+    ]
+
+    # 按间隔的遗忘率：与 _handle_remember/_handle_forget 相同，记得则间隔翻倍，忘记则重置为初始间隔。
+    # 每个单词的第一行和每次 forget 开启新的一段，段内累计的 remember 次数即当时的翻倍次数
+    segment_start = ~same_word | is_forget
+    starts = np.flatnonzero(segment_start)
+    remember_cumsum = np.cumsum(is_remember)
+    before_segment = remember_cumsum[starts] - is_remember[starts]
+    doublings = remember_cumsum - before_segment[np.cumsum(segment_start) - 1]
+    # 第 i 次作答前的间隔由第 i-1 行之后的翻倍次数决定
+    previous = np.flatnonzero(same_word) - 1
+    interval_doublings = np.minimum(doublings[previous], MAX_DOUBLINGS)
+    interval_reviews = np.bincount(interval_doublings, minlength=1)
+    interval_forgets = np.bincount(interval_doublings, weights=is_forget[same_word], minlength=1)
+    forgetting_by_interval = [
+        {
+            'interval_seconds': Config.INITIAL_INTERVAL * 2 ** n,
+            'reviews': int(interval_reviews[n]),
+            'forget_rate': float(interval_forgets[n] / interval_reviews[n]),
+        }
+        for n in range(len(interval_reviews)) if interval_reviews[n]
+    ]
+
+    # 每日作答直方图，按学习者时区的日期
+    day = np.floor((timestamp + utc_offset) / 86400).astype(np.int64)
+    first_day = int((now + utc_offset) // 86400) - days + 1
+    recent = day >= first_day
+    daily = {
+        name: np.bincount(day[recent & (action == code)] - first_day, minlength=days)[:days]
+        for name, code in ACTION_CODES.items()
+    }
+    epoch = datetime.date(1970, 1, 1)
+    daily_reviews = [
+        {'day': (epoch + datetime.timedelta(days=first_day + i)).isoformat(),
+         **{name: int(counts[i]) for name, counts in daily.items()}}
+        for i in range(days)
+    ]
+
+    # 最难单词：作答次数足够的单词中 forget 比例最高的
+    attempts = np.bincount(columns.word, minlength=len(columns.word_ids))
+    forgets = np.bincount(columns.word, weights=columns.action == FORGET, minlength=len(columns.word_ids))
+    forget_rate = np.where(attempts >= Config.ANALYTICS_MIN_ATTEMPTS, forgets / np.maximum(attempts, 1), 0)
+    ranked = np.lexsort((-attempts, -forget_rate))[:Config.ANALYTICS_HARDEST_LIMIT]
+    hardest = [
+        {'word_id': columns.word_ids[i], 'attempts': int(attempts[i]), 'forget_rate': float(forget_rate[i])}
+        for i in ranked if forget_rate[i] > 0
+    ]
+
+    return {
+        'total_logs': int(len(word)),
+        'retention_curve': retention_curve,
+        'forgetting_by_interval': forgetting_by_interval,
+        'daily_reviews': daily_reviews,
+        'hardest_words': hardest,
+    }
+
+
+def simulate_review_load(due: np.ndarray, interval: np.ndarray, days: int, recall_prob: float,
+                         runs: int, rng: np.random.Generator) -> np.ndarray:
+    """蒙特卡洛模拟每张卡片未来 days 天的复习，返回 (runs, days) 的每日复习次数矩阵
+
+    due 为各卡片下次复习时刻距今天（学习者时区）零点的秒数，interval 为当前间隔。
+    假设卡片一到期就被复习，记得则间隔翻倍、忘记则重置为初始间隔，与
+    _handle_remember/_handle_forget 相同。所有模拟同时推进，每轮处理每条轨迹的一次复习，
+    超出模拟范围的轨迹随即移出数组。
+    """
+    horizon = days * 86400
+    counts = np.zeros(runs * days, dtype=np.int64)
+    chunk = max(1, Config.FORECAST_MAX_SAMPLES // runs)
+    for start in range(0, len(due), chunk):
+        size = len(due[start:start + chunk])
+        t = np.repeat(due[start:start + chunk], runs)
+        step = np.repeat(interval[start:start + chunk], runs)
+        run = np.tile(np.arange(runs), size)
+        while True:
+            keep = t < horizon
+            t, step, run = t[keep], step[keep], run[keep]
+            if not t.size:
+                break
+            counts += np.bincount(run * days + (t // 86400).astype(np.int64), minlength=runs * days)
+            recalled = rng.random(t.size) < recall_prob
+            step = np.where(recalled, step * 2, Config.INITIAL_INTERVAL)
+            t = t + step
+    return counts.reshape(runs, days)
+
+
+def forecast_review_load(due: np.ndarray, interval: np.ndarray, days: int, recall_prob: float,
+                         runs: int, rng: np.random.Generator) -> tuple:
+    """在 FORECAST_MAX_REVIEWS 的预算内估计每日复习量，返回 ((模拟次数, days) 矩阵, 抽样卡片数)
+
+    先用少量卡片试算每条轨迹的复习次数（回忆率低时短间隔反复出现，次数会多很多），
+    预算够时所有卡片各模拟若干次；不够时每次模拟随机抽取一部分卡片，再按比例放大。
+    """
+    cards = len(due)
+    if not cards:
+        return np.zeros((1, days)), 0
+    pilot = rng.choice(cards, size=min(cards, Config.FORECAST_PILOT_CARDS), replace=False)
+    pilot_load = simulate_review_load(due[pilot], interval[pilot], days, recall_prob, 1, rng)
+    trajectories = int(Config.FORECAST_MAX_REVIEWS / max(pilot_load.sum() / len(pilot), 1.0))
+    if trajectories >= cards:
+        runs = max(1, min(runs, trajectories // cards))
+        return simulate_review_load(due, interval, days, recall_prob, runs, rng).astype(np.float64), cards
+
+    runs = min(runs, Config.FORECAST_SAMPLED_RUNS)
+    sample = max(trajectories // runs, 1)
+    loads = np.empty((runs, days))
+    for run in range(runs):
+        chosen = rng.choice(cards, size=sample, replace=False)
+        loads[run] = simulate_review_load(due[chosen], interval[chosen], days, recall_prob, 1, rng)[0] * (cards / sample)
+    return loads, sample
+
+
+class LearningAnalytics:
+    """学习分析：日志以列数组缓存在内存中，结果在有新日志写入前直接复用"""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self._columns: Dict[str, LogColumns] = {}
+        self._results: Dict[tuple, tuple] = {}  # (learner_id, days) -> (日志版本, 生成时间, 结果)
+        self._locks: Dict[str, asyncio.Lock] = {}  # 每个学习者一把锁，不同学习者的计算互不等待
+
+    async def get(self, learner_id: str, days: int) -> Dict:
+        async with self._locks.setdefault(learner_id, asyncio.Lock()):
+            version = self.db.click_logs.version
+            cached = self._results.get((learner_id, days))
+            if cached and cached[0] == version and time.monotonic() - cached[1] < Config.ANALYTICS_CACHE_TTL:
+                return cached[2]
+
+            columns = await self._refresh_columns(learner_id, version)
+            now = time.time()
+            utc_offset = datetime.datetime.now(Config.LEARNER_TIMEZONE).utcoffset().total_seconds()
+            if len(columns.word):
+                # 数组计算是纯 CPU 操作，放到线程中执行以免阻塞其他请求
+                result = await asyncio.to_thread(compute_analytics, columns, days, now, utc_offset)
+            else:
+                result = {'total_logs': 0, 'retention_curve': [], 'forgetting_by_interval': [],
+                          'daily_reviews': [], 'hardest_words': []}
+            await self._attach_words(result['hardest_words'])
+            result['interval_distribution'] = await self.db.get_interval_distribution()
+            result['learner_id'] = learner_id
+            result['generated_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+            self._results[(learner_id, days)] = (version, time.monotonic(), result)
+            return result
+
+    async def forecast(self, days: int, new_per_day: int, recall_prob: float, runs: int) -> Dict:
+        """按当前所有复习中卡片的 interval/next_review 预测未来每天的复习量"""
+        today_start, _ = today_range()
+        day_start = today_start.timestamp()
+        now = time.time() - day_start
+        due_parts, interval_parts = [], []
+
+        def add_batch(cards: List[Dict]):
+            due_parts.append(np.fromiter((c['next_review'].timestamp() for c in cards), np.float64, len(cards)))
+            interval_parts.append(np.fromiter(
+                (c.get('interval') or Config.INITIAL_INTERVAL for c in cards), np.float64, len(cards)
+            ))
+
+        cursor = self.db.user_collection.find(
+            {'status': 'reviewing', 'next_review': {'$ne': None}}, {'next_review': 1, 'interval': 1}
+        ).batch_size(Config.ANALYTICS_BATCH_SIZE)
+        batch = []
+        async for card in cursor:
+            batch.append(card)
+            if len(batch) >= Config.ANALYTICS_BATCH_SIZE:
+                add_batch(batch)
+                batch = []
+        add_batch(batch)
+        # 已过期的卡片视为现在复习
+        due = np.maximum(np.concatenate(due_parts) - day_start, now)
+        interval = np.concatenate(interval_parts)
+        reviewing = len(due)
+
+        # 新词：每天开始时（今天从现在起）引入 new_per_day 张，直到新词用完；首次作答也按 recall_prob 处理
+        available = await self.db.user_collection.count_documents({'status': 'new'})
+        new_total = min(new_per_day * days, available)
+        new_day = np.arange(new_total) // max(new_per_day, 1)
+        due = np.concatenate((due, np.maximum(new_day * 86400.0, now)))
+        interval = np.concatenate((interval, np.full(new_total, float(Config.INITIAL_INTERVAL))))
+
+        # 模拟是纯 CPU 计算，放到线程中执行以免阻塞其他请求
+        loads, sampled = await asyncio.to_thread(
+            forecast_review_load, due, interval, days, recall_prob, runs, np.random.default_rng()
+        )
+        new_words = np.bincount(new_day, minlength=days)
+        # 卡片很多时预算只够模拟一次，没有分布可言，p10/p90 返回 null 而不是等于均值
+        spread = len(loads) > 1
+        low, high = np.percentile(loads, [10, 90], axis=0)
+        today = datetime.datetime.now(Config.LEARNER_TIMEZONE).date()
+        return {
+            'reviewing_cards': reviewing,
+            'new_words_available': available,
+            'new_per_day': new_per_day,
+            'recall_prob': recall_prob,
+            'runs': len(loads),
+            'spread_available': spread,
+            'sampled_cards': sampled,
+            'days': [
+                {
+                    'day': (today + datetime.timedelta(days=i)).isoformat(),
+                    'new_words': int(new_words[i]),
+                    'expected_reviews': float(loads[:, i].mean()),
+                    'p10': float(low[i]) if spread else None,
+                    'p90': float(high[i]) if spread else None,
+                }
+                for i in range(days)
+            ],
+        }
+
+    async def _refresh_columns(self, learner_id: str, version: int) -> LogColumns:
+        columns = self._columns.get(learner_id)
+        # 日志 _id 只在单个进程内递增，无状态模式下其他进程写入的日志可能排在 last_id 之前，每次整体重建
+        if (Config.STATELESS or columns is None
+                or time.monotonic() - columns.loaded_at > Config.ANALYTICS_RELOAD_INTERVAL):
+            columns = self._columns[learner_id] = LogColumns()
+        # 只追加上次加载之后写入的日志
+        query = learner_filter(learner_id)
+        if columns.last_id is not None:
+            query['_id'] = {'$gt': columns.last_id}
+        cursor = self.db.log_collection.find(
+            query, {'word_id': 1, 'action': 1, 'timestamp': 1}
+        ).batch_size(Config.ANALYTICS_BATCH_SIZE)
+        batch = []
+        async for log in cursor:
+            batch.append(log)
+            if len(batch) >= Config.ANALYTICS_BATCH_SIZE:
+                await asyncio.to_thread(columns.extend, batch)
+                batch = []
+        await asyncio.to_thread(columns.extend, batch)
+        columns.version = version
+        return columns
+
+    async def _attach_words(self, hardest: List[Dict]):
+        if not hardest:
+            return
+        docs = await self.db.user_collection.find(
+            {'_id': {'$in': [item['word_id'] for item in hardest]}}, {'word': 1, 'status': 1}
+        ).to_list()
+        words = {doc['_id']: doc for doc in docs}
+        for item in hardest:
+            doc = words.get(item['word_id'], {})
+            item['word'] = doc.get('word')
+            item['status'] = doc.get('status')
+            item['word_id'] = str(item['word_id'])
+
+
+# ====================== 音频缓存模块 ======================
+def normalize_tts_text(text: str) -> str:
+    """规范化待合成文本：去掉 Markdown 加粗标记并合并多余空白"""
+    return ' '.join(text.replace('**', '').split())
+
+
+def pick_voice(text: str) -> str:
+    """中文占比超过一半时使用中文发音人"""
+    chinese_ratio = count_chinese_chars(text) / len(text) if text else 0
+    return "zh-CN-XiaoxiaoNeural" if chinese_ratio > 0.5 else "en-GB-LibbyNeural"
+
+
+# 所有合成共用的并发上限，避免批量请求和预取一起压垮上游
+tts_limiter = asyncio.Semaphore(Config.TTS_CONCURRENCY)
+_tts_client: Optional[httpx.AsyncClient] = None
+
+
+def get_tts_client() -> httpx.AsyncClient:
+    """HTTP TTS 后端共用一个连接池，不再每次合成新建连接"""
+    global _tts_client
+    if _tts_client is None:
+        _tts_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=Config.TTS_CONCURRENCY))
+    return _tts_client
+
+
+async def close_tts_client():
+    global _tts_client
+    if _tts_client is not None:
+        await _tts_client.aclose()
+        _tts_client = None
+
+
+def retry_delay(retries: int) -> float:
+    """第 retries 次失败后的等待时间：指数退避加全抖动，避免失败的请求同时重试"""
+    return random.uniform(0, min(Config.TTS_RETRY_MAX_DELAY, Config.TTS_RETRY_DELAY * 2 ** (retries - 1)))
+
+
+async def tts_chunks(text: str, voice: str) -> AsyncIterator[bytes]:
+    """向 TTS 后端请求一次合成，逐块产出音频数据"""
+    if Config.TTS_BACKEND_URL:
+        async with get_tts_client().stream('GET', Config.TTS_BACKEND_URL,
+                                           params={'text': text, 'voice': voice}) as resp:
+            resp.raise_for_status()
+            async for data in resp.aiter_bytes():
+                yield data
+        return
+    async for chunk in edge_tts.Communicate(text, voice).stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def synthesize_audio(text: str, voice: str) -> bytes:
+    """调用 TTS 合成完整音频，失败时按配置重试"""
+    retries = 0
+    while True:
+        try:
+            async with tts_limiter:
+                start = time.perf_counter()
+                audio_buffer = io.BytesIO()
+                async for data in tts_chunks(text, voice):
+                    audio_buffer.write(data)
+            record_tts(time.perf_counter() - start, 'full')
+            return audio_buffer.getvalue()
+        except Exception as e:
+            retries += 1
+            record_tts_failure('full', final=retries >= Config.TTS_MAX_RETRIES)
+            logger.warning('语音合成失败（第 %d 次）: %s', retries, e)
+            if retries >= Config.TTS_MAX_RETRIES:
+                raise HTTPException(status_code=503, detail="Failed to generate audio after multiple attempts.")
+            await asyncio.sleep(retry_delay(retries))
+
+
+class AudioStreamInterrupted(Exception):
+    """音频已开始下发后合成中断，此时不能再重试"""
+
+
+async def stream_audio(text: str, voice: str) -> AsyncIterator[bytes]:
+    """边合成边产出音频块；只有在尚未产出任何数据时才允许重试"""
+    retries = 0
+    while True:
+        started = False
+        try:
+            async with tts_limiter:
+                start = time.perf_counter()
+                async for data in tts_chunks(text, voice):
+                    started = True
+                    yield data
+            record_tts(time.perf_counter() - start, 'stream')
+            return
+        except Exception as e:
+            if started:
+                record_tts_failure('stream', final=True)
+                raise AudioStreamInterrupted(str(e)) from e
+            retries += 1
+            record_tts_failure('stream', final=retries >= Config.TTS_MAX_RETRIES)
+            logger.warning('语音合成失败（第 %d 次）: %s', retries, e)
+            if retries >= Config.TTS_MAX_RETRIES:
+                raise HTTPException(status_code=503, detail="Failed to generate audio after multiple attempts.")
+            await asyncio.sleep(retry_delay(retries))
+
+
+_STREAM_END = object()
+
+
+class AudioCache:
+    """按 (规范化文本, 发音人) 内容寻址的两级音频缓存
+
+    内存层和磁盘层都按字节数做 LRU 淘汰；同一文本的并发请求共享一次合成。
+    """
+
+    def __init__(self, cache_dir: str, max_disk_bytes: int, max_memory_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._memory: OrderedDict = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk_index: OrderedDict = OrderedDict()  # key -> 文件大小，按访问时间从旧到新
+        self._disk_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(text: str, voice: str) -> str:
+        return hashlib.sha256(f'{voice}\n{text}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.mp3')
+
+    def _load_disk_index(self):
+        """启动时扫描磁盘缓存，按修改时间恢复 LRU 顺序"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.mp3'):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _remember_in_memory(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 刷新修改时间，使重启后的 LRU 顺序保持一致
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """只查缓存，不触发合成"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return self._memory[key]
+        if key in self._disk_index:
+            data = await asyncio.to_thread(self._read_disk, key)
+            if data is not None:
+                self._disk_index.move_to_end(key)
+                self._remember_in_memory(key, data)
+                self.stats['disk_hits'] += 1
+                return data
+            # 文件被外部删除，修正索引
+            self._disk_bytes -= self._disk_index.pop(key)
+        return None
+
+    async def put(self, key: str, data: bytes):
+        self._remember_in_memory(key, data)
+        await asyncio.to_thread(self._write_disk, key, data)
+        if key in self._disk_index:
+            self._disk_bytes -= self._disk_index.pop(key)
+        self._disk_index[key] = len(data)
+        self._disk_bytes += len(data)
+        self._evict_disk()
+
+    async def get_or_synthesize(self, text: str, voice: str) -> bytes:
+        key = self.make_key(text, voice)
+        if (data := await self.get(key)) is not None:
+            return data
+
+        if key in self._inflight:
+            # 已有相同文本正在合成，直接等待其结果
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.stats['misses'] += 1
+        future = create_background_task(self._synthesize_and_store(key, text, voice))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _synthesize_and_store(self, key: str, text: str, voice: str) -> bytes:
+        data = await synthesize_audio(text, voice)
+        await self.put(key, data)
+        return data
+
+    async def open_stream(self, text: str, voice: str):
+        """流式获取音频
+
+        缓存命中或已有相同合成在进行时返回完整 bytes；否则在后台边合成边转发，
+        等到第一块数据就绪后返回异步迭代器。首块之前的失败会重试或抛出 503，
+        首块之后的失败会中断迭代，且不会写入缓存。
+        """
+        key = self.make_key(text, voice)
+        if (data := await self.get(key)) is not None:
+            return data
+        if key in self._inflight:
+            return await self.get_or_synthesize(text, voice)
+
+        self.stats['misses'] += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        future = create_background_task(self._stream_and_store(key, text, voice, queue))
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._finish_stream(key, f))
+
+        first = await queue.get()
+        if isinstance(first, BaseException):
+            raise first
+        if first is _STREAM_END:
+            return b''
+        return self._drain(first, queue)
+
+    def _finish_stream(self, key: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # 异常已经通过队列交给调用方，这里仅标记为已处理
+
+    @staticmethod
+    async def _drain(first: bytes, queue: asyncio.Queue) -> AsyncIterator[bytes]:
+        yield first
+        while (item := await queue.get()) is not _STREAM_END:
+            if isinstance(item, BaseException):
+                logger.warning('音频流中断: %s', item)
+                raise item
+            yield item
+
+    async def _stream_and_store(self, key: str, text: str, voice: str, queue: asyncio.Queue) -> bytes:
+        # 客户端断开不会影响这里，合成完成后仍然写入缓存供后续请求使用
+        buffer = io.BytesIO()
+        try:
+            async for chunk in stream_audio(text, voice):
+                buffer.write(chunk)
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(e)
+            raise
+        data = buffer.getvalue()
+        await self.put(key, data)
+        queue.put_nowait(_STREAM_END)
+        return data
+
+    def contains(self, key: str) -> bool:
+        return key in self._memory or key in self._disk_index or key in self._inflight
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'disk_entries': len(self._disk_index),
+            'disk_bytes': self._disk_bytes,
+            'inflight': len(self._inflight),
+        }
+
+
+# ====================== 音频预取模块 ======================
+def card_audio_texts(word: Dict) -> List[str]:
+    """卡片上可能被播放的文本，按播放可能性从高到低排列"""
+    texts = [word.get('word'), word.get('phrase')]
+    texts += [ex.get('text') for ex in word.get('examples', word.get('V2_examples')) or []]
+    texts.append(word.get('word_meaning', word.get('cn_word_meaning')))
+    return [normalize_tts_text(t) for t in texts if t]
+
+
+class AudioPrefetcher:
+    """选出卡片后在后台预先合成音频
+
+    使用有界优先队列：当前卡片优先级最高，越新的卡片越先处理；
+    接下来可能出现的卡片排在其后。队列满时丢弃新任务，不阻塞请求。
+    """
+    PRIORITY_CURRENT = 0
+    PRIORITY_UPCOMING = 1
+
+    def __init__(self, cache: AudioCache, db: DatabaseManager):
+        self.cache = cache
+        self.db = db
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._queued = set()
+        self._generation = 0
+        self._seq = 0
+        self._lookahead_task: Optional[asyncio.Task] = None
+        self.stats = {'queued': 0, 'dropped': 0, 'done': 0, 'failed': 0}
+
+    def start(self):
+        self.queue = asyncio.PriorityQueue(maxsize=Config.PREFETCH_QUEUE_SIZE)
+        self._workers = [create_background_task(self._worker()) for _ in range(Config.PREFETCH_CONCURRENCY)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit_card(self, word: Dict):
+        """把当前卡片及其后续卡片加入预取队列，不等待合成"""
+        if self.queue is None:
+            return
+        self._generation += 1
+        self._enqueue(card_audio_texts(word), self.PRIORITY_CURRENT)
+        if Config.PREFETCH_LOOKAHEAD > 0 and (self._lookahead_task is None or self._lookahead_task.done()):
+            self._lookahead_task = create_background_task(self._prefetch_upcoming(word.get('id')))
+
+    async def _prefetch_upcoming(self, current_id: Optional[str]):
+        try:
+            exclude_id = ObjectId(current_id) if current_id else None
+            words = await self.db.get_upcoming_words(exclude_id, Config.PREFETCH_LOOKAHEAD)
+        except Exception as e:
+            logger.warning('预取候选卡片查询失败: %s', e)
+            return
+        for word in words:
+            self._enqueue(card_audio_texts(word), self.PRIORITY_UPCOMING)
+
+    def _enqueue(self, texts: List[str], priority: int):
+        for text in texts:
+            voice = pick_voice(text)
+            key = AudioCache.make_key(text, voice)
+            if key in self._queued or self.cache.contains(key):
+                continue
+            self._seq += 1
+            try:
+                self.queue.put_nowait((priority, -self._generation, self._seq, text, voice))
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+                continue
+            self._queued.add(key)
+            self.stats['queued'] += 1
+
+    async def _worker(self):
+        while True:
+            _, _, _, text, voice = await self.queue.get()
+            try:
+                await self.cache.get_or_synthesize(text, voice)
+                self.stats['done'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.warning('音频预取失败: %s %s', text, e)
+            finally:
+                self._queued.discard(AudioCache.make_key(text, voice))
+                self.queue.task_done()
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, 'pending': self.queue.qsize() if self.queue else 0}
+
+
+# ====================== 批量音频模块 ======================
+async def synthesize_batch(cache: AudioCache, texts: List[str]) -> List[Dict]:
+    """并发合成一组文本（已规范化、去重），单条失败不影响其他文本
+
+    并发度由 tts_limiter 统一限制，缓存命中的文本不占用名额。
+    """
+    voices = [pick_voice(text) for text in texts]
+    results = await asyncio.gather(
+        *(cache.get_or_synthesize(text, voice) for text, voice in zip(texts, voices)),
+        return_exceptions=True
+    )
+    items = []
+    for text, voice, result in zip(texts, voices, results):
+        item = {'text': text, 'voice': voice, 'key': AudioCache.make_key(text, voice)}
+        if isinstance(result, BaseException):
+            item['error'] = result.detail if isinstance(result, HTTPException) else str(result)
+        else:
+            item['audio'] = result
+        items.append(item)
+    return items
+
+
+def multipart_audio_response(items: List[Dict]) -> Response:
+    """multipart/form-data 响应：manifest 部分为 JSON，之后每个成功的文本一个音频部分
+
+    浏览器可以直接用 response.formData() 解析。
+    """
+    boundary = uuid.uuid4().hex
+    manifest = []
+    parts = []
+    for i, item in enumerate(items):
+        entry = {key: value for key, value in item.items() if key != 'audio'}
+        if 'audio' in item:
+            entry['part'] = f'audio-{i}'
+            parts.append((
+                f'Content-Disposition: form-data; name="audio-{i}"; filename="{item["key"]}.mp3"\r\n'
+                f'Content-Type: audio/mpeg\r\n\r\n'.encode('utf-8'),
+                item['audio']
+            ))
+        manifest.append(entry)
+    parts.insert(0, (
+        b'Content-Disposition: form-data; name="manifest"\r\nContent-Type: application/json\r\n\r\n',
+        json.dumps({'items': manifest}, ensure_ascii=False).encode('utf-8')
+    ))
+    body = io.BytesIO()
+    for headers, data in parts:
+        body.write(f'--{boundary}\r\n'.encode('ascii'))
+        body.write(headers)
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('ascii'))
+    return Response(body.getvalue(), media_type=f'multipart/form-data; boundary={boundary}')
+
+
+# ====================== 推送模块 ======================
+class StatsBroadcaster:
+    """通过 SSE 向已连接的客户端推送计数变化
+
+    计数都取自内存：状态数量来自 StatusCounterCache，待复习数来自调度器，
+    今日学习数在首次连接时读一次、之后随作答累加。作答和标熟等写操作调用
+    notify()；后台定时器在下一张卡片到期和跨天时唤醒，没有变化时不访问数据库。
+    每个连接记住上次发送的内容，只发送变化的字段。
+    """
+
+    def __init__(self, db: DatabaseManager, scheduler: ReviewScheduler):
+        self.db = db
+        self.scheduler = scheduler
+        self._clients: Dict[asyncio.Event, str] = {}  # 连接的唤醒事件 -> learner_id
+        self._today: Dict[str, tuple] = {}  # learner_id -> (日期, 今日作答数)
+        self._rescheduled = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = create_background_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        """计数可能变化，唤醒所有连接重新比较；到期时间可能提前，定时器也重新计算"""
+        for changed in self._clients:
+            changed.set()
+        self._rescheduled.set()
+
+    def record_answers(self, learner_id: str, count: int):
+        today = self._today.get(learner_id)
+        if today is not None and today[0] == learning_day(datetime.datetime.now()):
+            self._today[learner_id] = (today[0], today[1] + count)
+        self.notify()
+
+    async def snapshot(self, learner_id: str) -> Dict:
+        counts = self.db.counters.peek()
+        if counts is None:
+            # 批量标熟等操作使计数失效后，由本次推送触发一次重新统计
+            counts = await self.db.counters.get()
+        if self.scheduler.ready:
+            counts['pending_review'] = self.scheduler.pending_count(datetime.datetime.now())
+        day = learning_day(datetime.datetime.now())
+        today = self._today.get(learner_id)
+        # 无状态模式下其他进程的作答不会累加到这里，每次都重新读取
+        if Config.STATELESS or today is None or today[0] != day:
+            today = self._today[learner_id] = (day, await self.db.get_today_learning_count(learner_id))
+        return {
+            'mastered': counts['mastered'],
+            'reviewing': counts['reviewing'],
+            'new': counts['new'],
+            'pending_review': counts['pending_review'],
+            'today_learning_count': today[1],
+        }
+
+    async def stream(self, learner_id: str) -> AsyncIterator[str]:
+        """一个 SSE 连接：先发送完整计数（snapshot），之后只发送变化的字段（delta）"""
+        changed = asyncio.Event()
+        self._clients[changed] = learner_id
+        last: Dict = {}
+        try:
+            while True:
+                current = await self.snapshot(learner_id)
+                if delta := {key: value for key, value in current.items() if last.get(key) != value}:
+                    yield f"event: {'delta' if last else 'snapshot'}\ndata: {json.dumps(delta)}\n\n"
+                    last = current
+                try:
+                    await asyncio.wait_for(changed.wait(), Config.STATS_PUSH_HEARTBEAT)
+                    changed.clear()
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+        finally:
+            del self._clients[changed]
+
+    def _next_wakeup(self) -> float:
+        """距下一次需要推送的秒数：下一张卡片到期、学习者时区跨天或心跳，取最早者"""
+        now = datetime.datetime.now()
+        _, today_end = today_range()
+        delay = min(Config.STATS_PUSH_HEARTBEAT, (today_end - now).total_seconds() + 0.001)
+        if self.scheduler.ready:
+            # 先把已到期的卡片移出未到期堆，剩下的到期时间都在将来，等待时间不会为 0
+            self.scheduler.pending_count(now)
+            if due := self.scheduler.next_due_time():
+                delay = min(delay, (due - now).total_seconds() + 0.001)
+        return max(delay, 0.001)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._tick()
+            except Exception as e:
+                # 单次出错不能让定时器退出，否则之后再也不会推送
+                logger.error('推送定时器出错: %s', e, exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _tick(self):
+        delay = self._next_wakeup()
+        try:
+            await asyncio.wait_for(self._rescheduled.wait(), delay)
+            self._rescheduled.clear()
+            return  # 写操作已经唤醒了各连接，这里只需重新计算下一次唤醒时间
+        except asyncio.TimeoutError:
+            pass
+        if not self._clients:
+            return
+        if not self.scheduler.ready:
+            # 无状态模式下没有内存调度器，只能按缓存有效期重新统计
+            try:
+                await self.db.counters.get()
+            except Exception as e:
+                logger.warning('推送计数刷新失败: %s', e)
+                return
+        for changed in self._clients:
+            changed.set()
 
 
 # ====================== FastAPI应用 ======================
 db_manager = DatabaseManager()
-learning_system = LearningSystem(db_manager)
+review_scheduler = ReviewScheduler(db_manager)
+new_word_queue = NewWordQueue(db_manager)
+learning_system = LearningSystem(db_manager, review_scheduler, new_word_queue)
+learning_analytics = LearningAnalytics(db_manager)
+audio_cache = AudioCache(Config.AUDIO_CACHE_DIR, Config.AUDIO_CACHE_MAX_BYTES, Config.AUDIO_MEMORY_CACHE_MAX_BYTES)
+audio_prefetcher = AudioPrefetcher(audio_cache, db_manager)
+stats_broadcaster = StatsBroadcaster(db_manager, review_scheduler)
 
 
 class UserResponse(BaseModel):
@@ -347,6 +2367,15 @@ class UserResponse(BaseModel):
     action: str  # remember/forget/master
 
 
+class UserResponseBatch(BaseModel):
+    responses: List[UserResponse] = Field(..., description="按作答顺序排列的评分列表")
+
+
+class AudioBatchRequest(BaseModel):
+    texts: List[str] = Field(default_factory=list, description="要合成的文本")
+    card_id: Optional[str] = Field(None, description="卡片ID，提供时合成该卡片上的全部文本")
+
+
 # 新的 Pydantic 模型，用于接收要标熟的单词
 class MarkWordAsMasteredRequest(BaseModel):
     word: str
@@ -387,6 +2416,11 @@ class CompleteStatus(BaseModel):
     status: str = Field(..., description="学习完成状态")
 
 
+class BatchCompleteStatus(BaseModel):
+    status: str = Field(..., description="学习完成状态")
+    applied: int = Field(..., description="已处理的评分条数")
+
+
 class StatsResponse(BaseModel):
     mastered: int = Field(..., description="已掌握单词数")
     reviewing: int = Field(..., description="复习中单词数")
@@ -394,100 +2428,234 @@ class StatsResponse(BaseModel):
     pending_review: int = Field(..., description="待复习的旧词数量")  # 新增
 
 
+# ====================== 响应序列化模块 ======================
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dump_json(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def json_response(request: Request, payload) -> Response:
+    """直接序列化已经按响应模型组装好的字典
+
+    跳过 FastAPI 按 response_model 的二次校验和 jsonable_encoder；
+    附带弱 ETag，客户端带 If-None-Match 且内容未变时返回 304；
+    客户端接受 gzip 且响应足够大时压缩。
+    """
+    body = dump_json(payload)
+    etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()
+    headers = {'ETag': etag, 'Vary': 'Accept-Encoding'}
+    if _etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+    if (Config.GZIP_ENABLED and len(body) >= Config.GZIP_MIN_BYTES
+            and 'gzip' in request.headers.get('accept-encoding', '')):
+        body = gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, media_type='application/json', headers=headers)
+
+
 # ====================== FastAPI端点修改 ======================
+def get_learner_id(x_learner_id: Optional[str] = Header(None)) -> str:
+    """从 X-Learner-Id 请求头识别学习者，未携带时使用默认学习者"""
+    return x_learner_id or Config.DEFAULT_LEARNER_ID
+
+
 @app.get("/next-word",
          summary="获取下一个学习单词",
          response_model=Union[WordResponse, CompleteStatus])
-def get_next_word(review_mode: str):
+async def get_next_word(request: Request, review_mode: str, learner_id: str = Depends(get_learner_id)):
     """获取下一个需要学习的单词"""
-    if word := learning_system.get_next_word(review_mode):
-        return word
-    return {"status": "complete"}
+    if word := await learning_system.get_next_word(review_mode, learner_id):
+        audio_prefetcher.submit_card(word)
+        return json_response(request, word)
+    return json_response(request, {"status": "complete"})
 
 
 @app.post("/submit-response",
           summary="提交用户响应",
           response_model=Union[WordResponse, CompleteStatus])
-def submit_response(response: UserResponse):
+async def submit_response(response: UserResponse, learner_id: str = Depends(get_learner_id)):
     """处理用户响应并返回下一个单词"""
     try:
-        ObjectId(response.word_id)
-    except ValueError:
+        word_id = ObjectId(response.word_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid word ID")
+
+    result = await learning_system.handle_response(word_id, response.action, learner_id)
+    stats_broadcaster.record_answers(learner_id, 1)
+    return result
+
+
+@app.get("/next-words",
+         summary="批量获取接下来的学习单词",
+         response_model=List[WordResponse])
+async def get_next_words(request: Request, review_mode: str,
+                         n: int = Query(10, ge=1, le=Config.MAX_BATCH_SIZE),
+                         learner_id: str = Depends(get_learner_id)):
+    """一次返回接下来的 n 张卡片，学完后为空列表"""
+    words = await learning_system.get_next_words(review_mode, learner_id, n)
+    # 逆序提交，使第一张卡片的音频最先预取
+    for word in reversed(words):
+        audio_prefetcher.submit_card(word)
+    return json_response(request, words)
+
+
+@app.post("/submit-responses",
+          summary="批量提交用户响应",
+          response_model=BatchCompleteStatus)
+async def submit_responses(batch: UserResponseBatch, learner_id: str = Depends(get_learner_id)):
+    """按顺序处理一批用户响应，单词更新合并为一次 bulk_write"""
+    if len(batch.responses) > Config.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail="Too many responses")
+    try:
+        responses = [(ObjectId(item.word_id), item.action) for item in batch.responses]
+    except (InvalidId, TypeError):
         raise HTTPException(status_code=400, detail="Invalid word ID")
+    if not responses:
+        return {"status": "complete", "applied": 0}
 
-    return learning_system.handle_response(response.action)
+    applied = await learning_system.handle_responses(responses, learner_id)
+    stats_broadcaster.record_answers(learner_id, applied)
+    return {"status": "complete", "applied": applied}
 
 
 # 生成音频流的路由
 @app.get("/generate_audio")
 async def generate_audio(request: Request):
-    print('请求语音接口')
-    text = request.query_params.get('text', "Hello, world!").replace('**', '')
-    chinese_ratio = sum('\u4e00' <= char <= '\u9fff' for char in text) / len(text) if text else 0
-    voice = "zh-CN-XiaoxiaoNeural" if chinese_ratio > 0.5 else "en-GB-LibbyNeural"
-
-    max_retries = 3
-    retries = 0
-    while retries < max_retries:
+    text = normalize_tts_text(request.query_params.get('text', "Hello, world!"))
+    voice = pick_voice(text)
+
+    # stream=1 时边合成边下发，缩短首字节时间
+    if request.query_params.get('stream', '').lower() in ('1', 'true'):
+        audio = await audio_cache.open_stream(text, voice)
+        if not isinstance(audio, bytes):
+            return StreamingResponse(audio, media_type='audio/mpeg')
+    else:
+        audio = await audio_cache.get_or_synthesize(text, voice)
+    return Response(audio, media_type='audio/mpeg')
+
+
+# 一次请求合成多条文本（或整张卡片）的音频
+@app.post("/generate_audio/batch", summary="批量生成音频")
+async def generate_audio_batch(batch: AudioBatchRequest, format: Literal['manifest', 'multipart'] = 'manifest'):
+    texts = [normalize_tts_text(text) for text in batch.texts]
+    if batch.card_id:
         try:
-            audio_buffer = io.BytesIO()
-            async for chunk in edge_tts.Communicate(text, voice).stream():
-                if chunk["type"] == "audio":
-                    audio_buffer.write(chunk["data"])
-
-            audio_buffer.seek(0)
-            return Response(audio_buffer.getvalue(), media_type='audio/mpeg')
-        except:
-            retries += 1
-            print(retries, '重试中')
-            if retries < max_retries:
-                await asyncio.sleep(2)  # 等待2秒后重试
-            else:
-                raise HTTPException(status_code=503, detail="Failed to generate audio after multiple attempts.")
+            word = await db_manager.user_collection.find_one({'_id': ObjectId(batch.card_id)}, CARD_PROJECTION)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid word ID")
+        if not word:
+            raise HTTPException(status_code=404, detail="Word not found")
+        texts += card_audio_texts(word)
+    texts = list(dict.fromkeys(text for text in texts if text))
+    if len(texts) > Config.TTS_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail="Too many texts")
+
+    items = await synthesize_batch(audio_cache, texts)
+    if format == 'multipart':
+        return multipart_audio_response(items)
+    for item in items:
+        if 'audio' in item:
+            item['audio'] = base64.b64encode(item['audio']).decode('ascii')
+    return {'items': items}
+
+
+# 学习分析：保持曲线、按间隔的遗忘率、每日作答直方图和最难单词
+@app.get("/analytics", summary="获取学习分析数据")
+async def get_analytics(request: Request, days: int = Query(30, ge=1, le=365),
+                        learner_id: str = Depends(get_learner_id)):
+    return json_response(request, await learning_analytics.get(learner_id, days))
+
+
+# 复习量预测：按当前复习状态蒙特卡洛模拟未来每天的复习次数
+@app.get("/forecast", summary="预测未来每天的复习量")
+async def get_forecast(days: int = Query(30, ge=1, le=Config.FORECAST_MAX_DAYS),
+                       new_per_day: int = Query(Config.DAILY_NEW_WORD_LIMIT or 20, ge=0, le=1000),
+                       recall_prob: float = Query(0.9, ge=0.5, le=1.0),
+                       runs: int = Query(Config.FORECAST_RUNS, ge=1, le=1000)):
+    return await learning_analytics.forecast(days, new_per_day, recall_prob, runs)
+
+
+# 计数推送：作答、标熟、卡片到期时通过 SSE 推送统计数字的变化，客户端无需轮询
+@app.get("/events", summary="订阅统计数字的变化（SSE）")
+async def stream_events(learner_id: Optional[str] = Query(None, description="EventSource 无法设置请求头时使用"),
+                        header_learner_id: str = Depends(get_learner_id)):
+    return StreamingResponse(
+        stats_broadcaster.stream(learner_id or header_learner_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# Prometheus 格式的监控指标
+@app.get("/metrics", summary="Prometheus 监控指标")
+async def get_metrics():
+    return Response(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 音频缓存命中统计
+@app.get("/audio-cache/stats", summary="获取音频缓存统计信息")
+async def get_audio_cache_stats():
+    return {**audio_cache.snapshot(), 'prefetch': audio_prefetcher.snapshot()}
+
+
+# 源数据更新后重新加载音节词典，无需重启服务
+@app.post("/syllables/reload", summary="重新加载音节词典")
+async def reload_syllables():
+    count = await db_manager.syllables.load()
+    return {"message": f"音节词典已重新加载 {count} 个单词", "count": count}
 
 
 # 新的接口：将指定单词标熟
 @app.post("/mark-word-as-mastered", summary="将指定单词标熟")
-def mark_word_as_mastered(request: MarkWordAsMasteredRequest):
-    db_manager.mark_word_as_mastered(request.word)
+async def mark_word_as_mastered(request: MarkWordAsMasteredRequest):
+    for word_id in await db_manager.mark_word_as_mastered(request.word):
+        review_scheduler.discard(word_id)
+    stats_broadcaster.notify()
     return {"message": f"单词 {request.word} 的所有条目已标熟"}
 
 
 # 新的接口：将指定单词标注为【不好】
 @app.post("/mark-word-as-bad", summary="将指定单词标注为【不好】")
-def mark_word_as_bad(request: MarkWordAsBadRequest):
+async def mark_word_as_bad(request: MarkWordAsBadRequest):
     try:
         word_id = ObjectId(request.word_id)
-    except ValueError:
+    except (InvalidId, TypeError):
         raise HTTPException(status_code=400, detail="Invalid word ID")
 
-    db_manager.mark_word_as_bad(word_id)
+    await db_manager.mark_word_as_bad(word_id)
+    review_scheduler.discard(word_id)
+    stats_broadcaster.notify()
     return {"message": f"单词 ID 为 {request.word_id} 的条目已标注为【不好】"}
 
 
 # 新增接口：获取待复习的旧词数量
 @app.get("/stats", summary="获取学习统计信息", response_model=StatsResponse)
-def get_stats():
+async def get_stats(request: Request):
     """获取学习统计信息，包括待复习的旧词数量"""
-    current_time = datetime.datetime.now(Config.TIMEZONE_UTC)
-
-    # 计算各种状态的单词数量
-    mastered_count = db_manager.user_collection.count_documents({'status': 'mastered'})
-    reviewing_count = db_manager.user_collection.count_documents({'status': 'reviewing'})
-    new_count = db_manager.user_collection.count_documents({'status': 'new'})
-
-    # 计算待复习的旧词数量
-    pending_review_count = db_manager.get_pending_review_count()
-
-    return {
-        'mastered': mastered_count,
-        'reviewing': reviewing_count,
-        'new': new_count,
-        'pending_review': pending_review_count
-    }
+    counts = await db_manager.counters.get()
+    return json_response(request, {
+        'mastered': counts['mastered'],
+        'reviewing': counts['reviewing'],
+        'new': counts['new'],
+        'pending_review': counts['pending_review']
+    })
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # 学习状态按 learner 存在数据库中，可以通过 WORDIE_WORKERS 启动多个工作进程；
+    # 多台机器部署时还需设置 WORDIE_STATELESS=1，见 Config.STATELESS
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=Config.WORKERS)
\ No newline at end of file
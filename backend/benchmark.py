@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+
+"""后端接口的延迟/吞吐基准测试
+
+在本地 MongoDB 中生成一套合成词库（含历史点击日志），启动一个假的 TTS 服务，
+然后在进程内（httpx ASGITransport）模拟多个学习者的作答会话，统计
+/next-word、/submit-response、/stats、/generate_audio（或 /generate_audio/batch）的 p50/p95/p99 延迟、
+每秒请求数以及每个请求触发的 MongoDB 命令数，结果写入 JSON 便于前后对比。
+
+用法示例：
+    python benchmark.py --cards 100000 --learners 8 --duration 60
+    python benchmark.py --cards 100000 --skip-seed   # 复用上次生成的数据
+"""
+
+import argparse
+import asyncio
+import contextvars
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pymongo
+from pymongo import MongoClient, monitoring
+
+BENCH_DB_PREFIX = 'wordie_bench'  # 基准测试使用的库名前缀，不会碰到正式数据
+SEED_BATCH_SIZE = 10000
+ACTION_WEIGHTS = {'remember': 0.7, 'forget': 0.25, 'master': 0.05}  # 模拟作答的动作分布
+COMPLETE_RETRY_DELAY = 1.0  # 没有可学的词时等待多久再取词（秒），期间可能有复习到期
+
+# 当前请求对应的接口名，Mongo 命令监听器据此把命令记到对应接口上
+current_endpoint = contextvars.ContextVar('current_endpoint', default='background')
+
+
+class CommandCounter(monitoring.CommandListener):
+    """按接口统计 MongoDB 命令数"""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.enabled = False
+
+    def started(self, event):
+        if self.enabled:
+            self.counts[current_endpoint.get()] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# ====================== 造数据 ======================
+def seed_database(client: MongoClient, names: dict, cards: int, logs_per_card: int, seed: int):
+    """生成 cards 张卡片：约 60% 新词、30% 复习中（到期时间分布在前后两天）、10% 已掌握"""
+    rng = random.Random(seed)
+    for db_name in names.values():
+        client.drop_database(db_name)
+    user_db = client[names['user']]
+    user_words = user_db['user_words']
+    click_logs = user_db['click_logs']
+    all_words = client[names['source']]['AllWords']
+
+    now = datetime.datetime.now()
+    words, logs, sources = [], [], []
+    for number in range(cards):
+        word = f'word{number}'
+        doc = {
+            'word': word,
+            'phrase': f'a phrase with {word}',
+            'cn_word_meaning': f'释义{number}',
+            'V2_examples': [
+                {'text': f'This is example {i} using **{word}**.', 'translation': f'例句 {i}'} for i in range(3)
+            ],
+            'number': number,
+            'line_number': number,
+            'status': 'new',
+            'interval': 300,
+            'wins': 0,
+            'losses': 0,
+        }
+        roll = rng.random()
+        if roll >= 0.6:
+            doc['first_learn_date'] = now - datetime.timedelta(days=rng.uniform(0, 30))
+            doc['wins'] = rng.randint(0, logs_per_card)
+            doc['losses'] = logs_per_card - doc['wins']
+            doc['reviews'] = logs_per_card
+            if roll < 0.9:
+                doc['status'] = 'reviewing'
+                doc['interval'] = 300 * 2 ** rng.randint(0, 10)
+                doc['next_review'] = now + datetime.timedelta(seconds=rng.uniform(-2, 2) * 86400)
+            else:
+                doc['status'] = 'mastered'
+                doc['next_review'] = None
+        words.append(doc)
+        sources.append({'word': word, 'syllables': '-'.join(word[i:i + 2] for i in range(0, len(word), 2))})
+
+        if len(words) >= SEED_BATCH_SIZE:
+            _flush_seed(user_words, click_logs, all_words, words, logs, sources, logs_per_card, rng, now)
+            words, logs, sources = [], [], []
+    if words:
+        _flush_seed(user_words, click_logs, all_words, words, logs, sources, logs_per_card, rng, now)
+    print(f'已生成 {cards} 张卡片，日志 {click_logs.estimated_document_count()} 条')
+
+
+def _flush_seed(user_words, click_logs, all_words, words, logs, sources, logs_per_card, rng, now):
+    user_words.insert_many(words, ordered=False)
+    for doc in words:
+        if 'first_learn_date' not in doc:
+            continue
+        for i in range(logs_per_card):
+            logs.append({
+                'word_id': doc['_id'],
+                'action': 'remember' if i < doc['wins'] else 'forget',
+                'timestamp': doc['first_learn_date'] + datetime.timedelta(hours=rng.uniform(0, 24 * 7)),
+                'learner_id': 'default',
+            })
+    if logs:
+        click_logs.insert_many(logs, ordered=False)
+    all_words.insert_many(sources, ordered=False)
+
+
+# ====================== 假 TTS 服务 ======================
+class FakeTTSHandler(BaseHTTPRequestHandler):
+    """按文本长度返回固定大小的假音频，模拟合成耗时"""
+    delay = 0.05
+    bytes_per_char = 400
+
+    def do_GET(self):
+        text = parse_qs(urlparse(self.path).query).get('text', [''])[0]
+        time.sleep(self.delay)
+        body = b'\xff\xf3' * (max(len(text), 1) * self.bytes_per_char // 2)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_tts(delay: float) -> ThreadingHTTPServer:
+    FakeTTSHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTTSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ====================== 会话回放 ======================
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.complete = 0  # /next-word 返回 complete（当前没有可学的词）的次数
+
+    async def call(self, endpoint: str, request):
+        token = current_endpoint.set(endpoint)
+        start = time.perf_counter()
+        try:
+            resp = await request
+        except Exception as e:
+            self.errors[endpoint] += 1
+            print(f'{endpoint} 请求异常: {e}')
+            return None
+        finally:
+            current_endpoint.reset(token)
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return resp
+
+
+async def run_session(client: httpx.AsyncClient, recorder: Recorder, learner_id: str, deadline: float,
+                      review_mode: str, audio_ratio: float, audio_batch: bool, stats_every: int,
+                      rng: random.Random):
+    """一个学习者的作答循环：取词 →（部分卡片）取音频 → 提交作答，定期查看统计"""
+    headers = {'X-Learner-Id': learner_id}
+    actions, weights = zip(*ACTION_WEIGHTS.items())
+    iteration = 0
+    while time.perf_counter() < deadline:
+        iteration += 1
+        resp = await recorder.call('/next-word', client.get(
+            '/next-word', params={'review_mode': review_mode}, headers=headers))
+        if resp is None:
+            continue
+        card = resp.json()
+        if card.get('status') == 'complete':
+            recorder.complete += 1
+            await asyncio.sleep(min(COMPLETE_RETRY_DELAY, max(deadline - time.perf_counter(), 0)))
+            continue
+        if rng.random() < audio_ratio:
+            if audio_batch:
+                # 一次请求取整张卡片的音频
+                await recorder.call('/generate_audio/batch', client.post(
+                    '/generate_audio/batch', params={'format': 'multipart'}, json={'card_id': card['id']}))
+            else:
+                text = rng.choice([card['word'], card['phrase']] + [e['text'] for e in card['examples']])
+                await recorder.call('/generate_audio', client.get('/generate_audio', params={'text': text}))
+        await recorder.call('/submit-response', client.post('/submit-response', headers=headers, json={
+            'word_id': card['id'], 'action': rng.choices(actions, weights)[0]}))
+        if iteration % stats_every == 0:
+            await recorder.call('/stats', client.get('/stats'))
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] * 1000 if values else None
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+def summarize(recorder: Recorder, counter: CommandCounter, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        p50, p95, p99 = percentiles(values)
+        endpoints[endpoint] = {
+            'count': len(values),
+            'errors': recorder.errors[endpoint],
+            'rps': len(values) / elapsed,
+            'mean_ms': statistics.fmean(values) * 1000,
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'mongo_ops_per_request': counter.counts[endpoint] / len(values),
+        }
+    total_requests = sum(len(values) for values in recorder.latencies.values())
+    total_ops = sum(counter.counts.values())
+    return {
+        'endpoints': endpoints,
+        'total': {
+            'requests': total_requests,
+            'duration_s': elapsed,
+            'rps': total_requests / elapsed,
+            'mongo_ops': total_ops,
+            'mongo_ops_per_request': total_ops / total_requests if total_requests else None,
+            # 写回队列、日志缓冲等后台任务发出的命令
+            'background_mongo_ops': counter.counts['background'],
+            'next_word_complete': recorder.complete,
+        },
+    }
+
+
+async def replay(args, counter: CommandCounter) -> dict:
+    import app as backend  # 环境变量必须在导入前设置好
+
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            recorder = Recorder()
+            rng = random.Random(args.seed)
+            # 预热：不计入统计
+            await run_session(client, Recorder(), 'bench-warmup', time.perf_counter() + args.warmup,
+                              args.review_mode, args.audio_ratio, args.audio_batch, args.stats_every, rng)
+            counter.enabled = True
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                run_session(client, recorder, f'bench-{i}', deadline, args.review_mode, args.audio_ratio,
+                            args.audio_batch, args.stats_every, random.Random(args.seed + i))
+                for i in range(args.learners)
+            ))
+            elapsed = time.perf_counter() - start
+            counter.enabled = False
+    return summarize(recorder, counter, elapsed)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict):
+    print(f"{'接口':<20}{'次数':>8}{'RPS':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'Mongo/请求':>12}")
+    for endpoint, row in result['endpoints'].items():
+        print(f"{endpoint:<20}{row['count']:>8}{row['rps']:>9.1f}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['mongo_ops_per_request']:>12.2f}")
+    total = result['total']
+    print(f"合计 {total['requests']} 个请求，{total['rps']:.1f} 请求/秒，"
+          f"平均每请求 {total['mongo_ops_per_request'] or 0:.2f} 次 Mongo 命令，后台命令 {total['background_mongo_ops']} 次")
+    if total['next_word_complete']:
+        print(f"/next-word 有 {total['next_word_complete']} 次返回 complete（没有可学的词），"
+              f"可增大 --cards 或换用 --review-mode old_mode")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Wordie 后端基准测试')
+    parser.add_argument('--db-host', default='mongodb://localhost:27017/')
+    parser.add_argument('--cards', type=int, default=10000, help='合成词库大小（建议 1 万到 100 万）')
+    parser.add_argument('--logs-per-card', type=int, default=5, help='每张已学卡片的历史点击日志数')
+    parser.add_argument('--skip-seed', action='store_true', help='复用已有的基准测试数据')
+    parser.add_argument('--learners', type=int, default=4, help='并发学习者会话数')
+    parser.add_argument('--duration', type=float, default=30, help='计时回放时长（秒）')
+    parser.add_argument('--warmup', type=float, default=3, help='预热时长（秒），不计入结果')
+    parser.add_argument('--review-mode', default='old_mode', choices=['old_mode', 'new_today_only'])
+    parser.add_argument('--audio-ratio', type=float, default=0.5, help='每张卡片请求音频的概率')
+    parser.add_argument('--audio-batch', action='store_true', help='用批量接口一次取整张卡片的音频')
+    parser.add_argument('--stats-every', type=int, default=10, help='每作答多少张卡片查看一次 /stats')
+    parser.add_argument('--tts-delay', type=float, default=0.05, help='假 TTS 服务每次合成的耗时（秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'benchmark_results'))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started_at = datetime.datetime.now()
+    names = {
+        'user': f'{BENCH_DB_PREFIX}_{args.cards}',
+        'mastered': f'{BENCH_DB_PREFIX}_{args.cards}_mastered',
+        'source': f'{BENCH_DB_PREFIX}_{args.cards}_source',
+    }
+    if not args.skip_seed:
+        seed_client = MongoClient(args.db_host)
+        seed_start = time.perf_counter()
+        seed_database(seed_client, names, args.cards, args.logs_per_card, args.seed)
+        seed_client.close()
+        print(f'造数据耗时 {time.perf_counter() - seed_start:.1f} 秒')
+
+    tts_server = start_fake_tts(args.tts_delay)
+    audio_cache_dir = tempfile.mkdtemp(prefix='wordie_bench_audio_')
+    os.environ.update({
+        'WORDIE_DB_HOST': args.db_host,
+        'WORDIE_USER_DB': names['user'],
+        'WORDIE_MASTERED_DB': names['mastered'],
+        'WORDIE_SOURCE_DB': names['source'],
+        'WORDIE_AUDIO_CACHE_DIR': audio_cache_dir,
+        'WORDIE_TTS_URL': f'http://127.0.0.1:{tts_server.server_port}/tts',
+        'WORDIE_WORKERS': '1',
+    })
+    # 监听器需要在后端创建 MongoClient 之前注册
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    result = asyncio.run(replay(args, counter))
+    tts_server.shutdown()
+
+    result = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'config': vars(args),
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pymongo': pymongo.version,
+            'git_commit': git_commit(),
+        },
+        **result,
+    }
+    print_report(result)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"bench-{started_at:%Y%m%d-%H%M%S}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存到 {output_path}')
+
+
+if __name__ == '__main__':
+    main()
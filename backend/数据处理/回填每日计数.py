@@ -0,0 +1,66 @@
+import datetime
+import os
+from collections import Counter
+
+from pymongo import MongoClient, UpdateOne
+from pytz import timezone
+
+# 数据库配置
+DB_HOST = 'mongodb://localhost:27017/'
+USER_DB_NAME = 'word_learning_v7'
+LOG_COLLECTION = 'click_logs'
+DAILY_COUNTS_COLLECTION = 'daily_counts'
+DEFAULT_LEARNER_ID = 'default'  # 旧日志没有 learner_id 时归入的学习者
+LEARNER_TIMEZONE = timezone(os.getenv('WORDIE_TIMEZONE', 'Asia/Shanghai'))  # 与后端 Config 保持一致
+BATCH_SIZE = 1000  # 每批 bulk_write 的更新条数
+
+
+def learning_day(timestamp: datetime.datetime) -> str:
+    """日志时间戳是服务器本地 naive 时间，换算到学习者时区后取日期"""
+    return timestamp.astimezone(LEARNER_TIMEZONE).date().isoformat()
+
+
+def backfill_daily_counts():
+    """根据 click_logs 重建 daily_counts 中每个学习者每天的作答次数和首次学习的新词数
+
+    一次性迁移脚本，可重复执行（结果以日志为准直接覆盖）。
+    需要在后端所在的机器上运行，日志时间戳按本机时区解释；
+    执行期间请停止后端服务，避免与在线的 $inc 更新交错。
+    """
+    client = MongoClient(DB_HOST)
+    db = client[USER_DB_NAME]
+    log_collection = db[LOG_COLLECTION]
+    daily_counts_collection = db[DAILY_COUNTS_COLLECTION]
+
+    # 时区换算在 Python 中完成：库里的 naive 时间被 MongoDB 当作 UTC，$dateToString 无法正确分日
+    counts = Counter()
+    first_seen = {}  # (学习者, 单词) -> 第一次作答的时间
+    for log in log_collection.find({}, {'_id': 0, 'timestamp': 1, 'learner_id': 1, 'word_id': 1}):
+        learner_id = log.get('learner_id') or DEFAULT_LEARNER_ID
+        counts[(learner_id, learning_day(log['timestamp']))] += 1
+        key = (learner_id, log['word_id'])
+        if key not in first_seen or log['timestamp'] < first_seen[key]:
+            first_seen[key] = log['timestamp']
+    new_counts = Counter((learner_id, learning_day(timestamp)) for (learner_id, _), timestamp in first_seen.items())
+
+    # 先清空旧计数：旧版本并发插入的同一天重复文档一并删除，之后后端才能建立唯一索引
+    daily_counts_collection.delete_many({})
+    operations = []
+    for (learner_id, day), count in counts.items():
+        operations.append(UpdateOne(
+            {'learner_id': learner_id, 'day': day},
+            {'$set': {'count': count, 'new_count': new_counts[(learner_id, day)]}},
+            upsert=True
+        ))
+        if len(operations) >= BATCH_SIZE:
+            daily_counts_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        daily_counts_collection.bulk_write(operations, ordered=False)
+
+    client.close()
+    print(f"已根据日志回填 {len(counts)} 个每日计数")
+
+
+if __name__ == "__main__":
+    backfill_daily_counts()
@@ -0,0 +1,52 @@
+from pymongo import MongoClient, UpdateOne
+
+# 数据库配置
+DB_HOST = 'mongodb://localhost:27017/'
+USER_DB_NAME = 'word_learning_v7'
+USER_COLLECTION = 'user_words'
+LOG_COLLECTION = 'click_logs'
+BATCH_SIZE = 1000  # 每批 bulk_write 的更新条数
+
+
+def backfill_win_counters():
+    """根据 click_logs 重建 user_words 上的 wins / losses 计数
+
+    一次性迁移脚本，可重复执行（结果以日志为准直接覆盖）。
+    执行期间请停止后端服务，避免与在线的 $inc 更新交错。
+    """
+    client = MongoClient(DB_HOST)
+    db = client[USER_DB_NAME]
+    user_collection = db[USER_COLLECTION]
+    log_collection = db[LOG_COLLECTION]
+
+    # 在服务端按单词聚合胜负次数，remember / master 记为胜，其余记为负
+    pipeline = [
+        {'$group': {
+            '_id': '$word_id',
+            'wins': {'$sum': {'$cond': [{'$in': ['$action', ['remember', 'master']]}, 1, 0]}},
+            'losses': {'$sum': {'$cond': [{'$in': ['$action', ['remember', 'master']]}, 0, 1]}},
+        }}
+    ]
+
+    operations = []
+    updated = 0
+    for row in log_collection.aggregate(pipeline, allowDiskUse=True):
+        operations.append(UpdateOne({'_id': row['_id']}, {'$set': {'wins': row['wins'], 'losses': row['losses']}}))
+        if len(operations) >= BATCH_SIZE:
+            updated += user_collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += user_collection.bulk_write(operations, ordered=False).modified_count
+
+    # 没有任何日志的单词补零，之后 _format_word 不再需要回退扫描
+    zeroed = user_collection.update_many(
+        {'wins': {'$exists': False}},
+        {'$set': {'wins': 0, 'losses': 0}}
+    ).modified_count
+
+    client.close()
+    print(f"已根据日志回填 {updated} 个单词的胜负计数，另有 {zeroed} 个单词补零")
+
+
+if __name__ == "__main__":
+    backfill_win_counters()
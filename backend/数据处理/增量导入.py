@@ -0,0 +1,147 @@
+"""三个导入脚本共用的增量导入逻辑
+
+不再 delete_many 后整体重新插入，而是：
+  1. 对每个文档的内容字段计算哈希，与上次导入记录在 _import_hashes 中的哈希比较，没变的直接跳过；
+  2. 变化的文档用 bulk_write 批量 upsert，按 _id（没有 _id 时按 word + phrase）定位；
+  3. 学习进度字段只在插入新文档时写入（$setOnInsert），已有单词的学习进度保持不变；
+  4. 每批写完后把已处理的文档数写进检查点文件，中断后重新运行会从该位置继续。
+
+增量模式不会删除导出文件中已经不存在的文档，需要删除时使用 replace 模式。
+replace 模式清空集合时必须同时调用 clear_import_hashes，否则下次增量导入会把
+已不在集合中的文档当作“未变化”跳过。
+"""
+import hashlib
+import json
+import os
+
+import bson
+from pymongo import UpdateOne
+
+HASH_COLLECTION = '_import_hashes'  # 记录每个文档上次导入时的内容哈希
+CHECKPOINT_DIR = 'import_checkpoints'  # 检查点文件所在目录
+# 后端在学习过程中维护的字段，导入时不覆盖已有文档上的值
+PROGRESS_FIELDS = (
+    'status', 'interval', 'next_review', 'first_learn_date', 'consecutive_remember_count',
+    'reviews', 'wins', 'losses',
+)
+
+
+def document_key(document):
+    """返回 (upsert 过滤条件, 哈希表中的键)"""
+    if '_id' in document:
+        return {'_id': document['_id']}, str(document['_id'])
+    return {'word': document['word'], 'phrase': document.get('phrase')}, f"{document['word']}\x00{document.get('phrase')}"
+
+
+def content_hash(document):
+    """只对内容字段计算哈希，学习进度的变化不算作文档变化"""
+    content = {key: value for key, value in document.items() if key not in PROGRESS_FIELDS}
+    return hashlib.sha1(bson.encode(content)).hexdigest()
+
+
+def _file_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _load_checkpoint(checkpoint_path, file_path):
+    """返回上次中断时已处理的文档数；导出文件已变化时检查点作废"""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('file') != _file_signature(file_path):
+        return 0
+    return checkpoint['processed']
+
+
+def _save_checkpoint(checkpoint_path, file_path, processed):
+    # 先写临时文件再替换，避免中断时留下半个检查点
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'file': _file_signature(file_path), 'processed': processed}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _build_update(document):
+    content = {key: value for key, value in document.items() if key not in PROGRESS_FIELDS and key != '_id'}
+    progress = {key: value for key, value in document.items() if key in PROGRESS_FIELDS}
+    update = {}
+    if content:
+        update['$set'] = content
+    if progress:
+        update['$setOnInsert'] = progress
+    return update
+
+
+def incremental_import(db, collection_name, documents, file_path, batch_size=1000):
+    """把 documents（可迭代对象）增量导入到 db[collection_name]
+
+    返回 {'upserted': 新插入数, 'modified': 更新数, 'unchanged': 跳过数, 'resumed': 从第几个文档继续}
+    """
+    collection = db[collection_name]
+    hash_collection = db[HASH_COLLECTION]
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f'{db.name}.{collection_name}.json')
+    resumed = _load_checkpoint(checkpoint_path, file_path)
+
+    # 上次导入时各文档的哈希，哈希表的 _id 为 "集合名:文档键"
+    prefix = f'{collection_name}:'
+    known_hashes = {
+        row['_id'][len(prefix):]: row['hash']
+        for row in hash_collection.find({'collection': collection_name}, {'hash': 1})
+    }
+
+    stats = {'upserted': 0, 'modified': 0, 'unchanged': 0, 'resumed': resumed}
+    operations, hash_operations = [], []
+    processed = 0
+
+    def flush():
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            stats['upserted'] += result.upserted_count
+            stats['modified'] += result.modified_count
+            # 数据写入成功后再记录哈希，中断时最多重复写一批
+            hash_collection.bulk_write(hash_operations, ordered=False)
+            operations.clear()
+            hash_operations.clear()
+        _save_checkpoint(checkpoint_path, file_path, processed)
+
+    for document in documents:
+        processed += 1
+        if processed <= resumed:
+            continue
+        key_filter, key = document_key(document)
+        digest = content_hash(document)
+        update = _build_update(document)
+        if known_hashes.get(key) == digest or not update:
+            stats['unchanged'] += 1
+        else:
+            operations.append(UpdateOne(key_filter, update, upsert=True))
+            hash_operations.append(UpdateOne(
+                {'_id': prefix + key},
+                {'$set': {'collection': collection_name, 'hash': digest}},
+                upsert=True
+            ))
+        if processed % batch_size == 0:
+            flush()
+    flush()
+
+    # 全部完成后删除检查点，下次运行从头比较
+    os.remove(checkpoint_path)
+    return stats
+
+
+def clear_import_hashes(db, collection_name):
+    """集合被清空后删除它的导入哈希和检查点"""
+    db[HASH_COLLECTION].delete_many({'collection': collection_name})
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f'{db.name}.{collection_name}.json')
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def format_stats(stats):
+    text = f"新增 {stats['upserted']} 条，更新 {stats['modified']} 条，未变化 {stats['unchanged']} 条"
+    if stats['resumed']:
+        text += f"（从第 {stats['resumed'] + 1} 条继续）"
+    return text
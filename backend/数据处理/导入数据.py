@@ -3,11 +3,13 @@ import os
 from pymongo import MongoClient
 from bson import ObjectId, Decimal128
 from datetime import datetime
+from 增量导入 import incremental_import, format_stats, clear_import_hashes
 
 # 数据库配置
 DB_HOST = 'mongodb://localhost:27017/'
 USER_DB_NAME = 'word_learning_v5'
 INPUT_DIR = 'mongo_export'  # 导入文件所在目录
+IMPORT_MODE = 'replace'  # 'replace' 清空集合后重新插入；'incremental' 只写入变化的文档并保留学习进度
 
 
 class MongoDecoder(json.JSONDecoder):
@@ -65,8 +67,16 @@ def import_json_to_mongodb():
             # 获取集合
             collection = db[collection_name]
 
+            if IMPORT_MODE == 'incremental':
+                if isinstance(documents, dict):
+                    documents = [documents]
+                stats = incremental_import(db, collection_name, documents, file_path)
+                print(f"已增量导入集合: {collection_name}，{format_stats(stats)}")
+                continue
+
             # 清空现有数据（如果有）
             collection.delete_many({})
+            clear_import_hashes(db, collection_name)
 
             # 导入数据
             if documents:
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from bson.errors import InvalidId
+from 增量导入 import incremental_import, format_stats, clear_import_hashes
+
+try:
+    import resource  # 仅类 Unix 系统提供，用于统计峰值内存
+except ImportError:
+    resource = None
+
+# 数据库配置
+DB_HOST = 'mongodb://localhost:27017/'
+USER_DB_NAME = 'word_learning_v7'
+INPUT_DIR = 'mongo_export'  # 导入文件所在目录
+BATCH_SIZE = 1000  # 每批 insert_many 的文档数
+READ_CHUNK_SIZE = 1024 * 1024  # 每次从文件读取的字符数
+MAX_WORKERS = os.cpu_count() or 1  # 并行导入的进程数，每个进程负责一个集合
+IMPORT_MODE = 'replace'  # 'replace' 清空集合后重新插入；'incremental' 只写入变化的文档并保留学习进度
+
+
+def convert_value(value):
+    """把 fromisoformat 能解析的字符串转换成 datetime，其余原样返回
+
+    与 V2 一样接受 fromisoformat 认识的所有写法（纯日期 2024-01-05、空格分隔的
+    2024-01-05 12:00:00、20240105 等）。这些写法都以四位数字年份开头，先用这一点
+    做廉价判断，绝大多数普通字符串在这里就被排除，不会进入日期解析。
+    """
+    if isinstance(value, str) and len(value) >= 7 and value[:4].isdigit():
+        try:
+            # 旧版本 Python 的 fromisoformat 不认识 Z 后缀
+            return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            return value
+    return value
+
+
+def object_hook(dct):
+    """与 V2 的 MongoDecoder 相同：还原 _id 为 ObjectId，日期字符串还原为 datetime"""
+    if '_id' in dct and isinstance(dct['_id'], str):
+        try:
+            dct['_id'] = ObjectId(dct['_id'])
+        except InvalidId:
+            pass
+    for key, value in dct.items():
+        if isinstance(value, str):
+            dct[key] = convert_value(value)
+    return dct
+
+
+def iter_documents(file_path):
+    """逐个产出导出文件中的文档，不把整个文件读入内存
+
+    导出文件是一个 JSON 数组（或单个对象）。按块读取文件，
+    用 raw_decode 每次解析出一个元素，缓冲区里只保留尚未解析的部分。
+    """
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer:
+            return
+        if not buffer.startswith('['):
+            # 单个对象的文件按原来的方式整体解析
+            yield decoder.decode(buffer + f.read())
+            return
+
+        pos = 1
+        eof = False
+        while True:
+            # 跳过元素之间的空白和逗号
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                document, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # 当前元素还没读完整，丢掉已解析的部分后继续读下一块
+                buffer = buffer[pos:]
+                pos = 0
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield document
+            pos = end
+
+
+def peak_memory_mb():
+    """当前进程生命周期内的峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def insert_batch(collection, batch):
+    """无序批量插入，单条失败不影响同批其他文档，返回成功写入的条数"""
+    try:
+        return len(collection.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        print(f"{collection.name}: {len(e.details['writeErrors'])} 条记录写入失败")
+        return e.details['nInserted']
+
+
+def import_collection(file_path):
+    """在独立进程中导入一个集合，返回 (集合名, 处理条数, 耗时秒数, 峰值内存MB, 增量统计)"""
+    start = time.perf_counter()
+    collection_name = os.path.splitext(os.path.basename(file_path))[0]
+    client = MongoClient(DB_HOST)
+    db = client[USER_DB_NAME]
+
+    if IMPORT_MODE == 'incremental':
+        stats = incremental_import(db, collection_name, iter_documents(file_path), file_path, BATCH_SIZE)
+        client.close()
+        processed = stats['upserted'] + stats['modified'] + stats['unchanged']
+        return collection_name, processed, time.perf_counter() - start, peak_memory_mb(), stats
+
+    collection = db[collection_name]
+    # 清空现有数据（如果有）
+    collection.delete_many({})
+    clear_import_hashes(db, collection_name)
+
+    imported = 0
+    batch = []
+    for document in iter_documents(file_path):
+        batch.append(document)
+        if len(batch) >= BATCH_SIZE:
+            imported += insert_batch(collection, batch)
+            batch = []
+    if batch:
+        imported += insert_batch(collection, batch)
+
+    client.close()
+    return collection_name, imported, time.perf_counter() - start, peak_memory_mb(), None
+
+
+def format_memory(peak):
+    return f"{peak:.1f} MB" if peak is not None else "未知"
+
+
+def import_json_to_mongodb():
+    """从JSON文件导入数据到MongoDB，每个集合一个进程并行导入"""
+    # 检查输入目录是否存在
+    if not os.path.exists(INPUT_DIR):
+        print(f"错误: 目录 '{INPUT_DIR}' 不存在")
+        return
+
+    # 获取所有JSON文件
+    json_files = [os.path.join(INPUT_DIR, f) for f in os.listdir(INPUT_DIR) if f.endswith('.json')]
+
+    start = time.perf_counter()
+    total = 0
+    # 每个进程只导入一个集合就退出，ru_maxrss 才是该集合自己的峰值内存，而不是复用进程的历史最高值
+    with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(json_files) or 1), max_tasks_per_child=1) as executor:
+        futures = {executor.submit(import_collection, path): path for path in json_files}
+        for future in as_completed(futures):
+            try:
+                collection_name, imported, elapsed, peak, stats = future.result()
+            except Exception as e:
+                print(f"导入失败: {futures[future]}，错误: {str(e)}")
+                continue
+            total += imported
+            detail = f"，{format_stats(stats)}" if stats else ""
+            print(f"已导入集合: {collection_name}，共 {imported} 条记录{detail}，"
+                  f"{imported / max(elapsed, 1e-9):.0f} 条/秒，峰值内存 {format_memory(peak)}")
+
+    elapsed = time.perf_counter() - start
+    print(f"所有JSON文件已导入到数据库: {USER_DB_NAME}，共 {total} 条记录，"
+          f"耗时 {elapsed:.1f} 秒，{total / max(elapsed, 1e-9):.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    import_json_to_mongodb()
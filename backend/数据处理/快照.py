@@ -0,0 +1,227 @@
+"""学习进度快照：导出与恢复
+
+导出时按批次流式读取各集合，文档以原始 BSON 字节（不做解码/再编码）依次写入
+gzip 压缩文件，即 mongodump 使用的「BSON 文档首尾相接」格式，内存占用与集合大小无关。
+连接的是副本集或分片集群时，所有集合在同一个 snapshot 会话中读取，得到同一时间点的一致快照；
+单机部署不支持 snapshot 读，会给出提示并逐个集合导出。
+
+恢复时按 manifest 把文件写回原来的库：
+  replace  清空集合后按批无序插入（与导入数据V3 相同）；
+  merge    按快照逐个覆盖同一文档（包括学习进度字段），快照之外的现有文档保留不动。
+
+用法：
+    python 快照.py export                       # 导出到 snapshots/<时间>/
+    python 快照.py restore snapshots/20250101-120000
+    python 快照.py restore snapshots/20250101-120000 --mode merge
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import time
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from 导入数据V3 import insert_batch, peak_memory_mb, format_memory
+from 增量导入 import clear_import_hashes
+
+# 数据库配置
+DB_HOST = 'mongodb://localhost:27017/'
+USER_DB_NAME = 'word_learning_v7'
+MASTERED_DB_NAME = 'mastered_words_db'
+# 需要备份的学习进度集合：(库名, 集合名)
+COLLECTIONS = [
+    (USER_DB_NAME, 'user_words'),
+    (USER_DB_NAME, 'click_logs'),
+    (USER_DB_NAME, 'daily_counts'),
+    (USER_DB_NAME, 'last_five_words'),
+    (MASTERED_DB_NAME, 'mastered_words'),
+]
+# 有唯一索引的集合 merge 时按唯一键定位文档，其余按 _id
+MERGE_KEYS = {
+    'daily_counts': ('learner_id', 'day'),
+}
+OUTPUT_DIR = 'snapshots'  # 快照输出目录
+BATCH_SIZE = 10000  # 游标每批读取的文档数，也是恢复时每批插入的文档数
+COMPRESS_LEVEL = 1  # gzip 压缩级别，1 最快，备份大量日志时压缩往往是瓶颈
+FORMAT_VERSION = 1
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def supports_snapshot(client) -> bool:
+    """snapshot 读只在副本集和分片集群上可用"""
+    hello = client.admin.command('hello')
+    return 'setName' in hello or hello.get('msg') == 'isdbgrid'
+
+
+def export_collection(collection, file_path, session=None):
+    """把一个集合流式写入 gzip 压缩的 BSON 文件，返回 (文档数, 原始字节数)"""
+    count = 0
+    raw_bytes = 0
+    with gzip.open(file_path, 'wb', compresslevel=COMPRESS_LEVEL) as f:
+        # 按 _id 顺序读取，恢复时插入的顺序与原集合一致
+        cursor = collection.find({}, session=session, batch_size=BATCH_SIZE).sort('_id', 1)
+        for document in cursor:
+            data = document.raw
+            f.write(data)
+            count += 1
+            raw_bytes += len(data)
+    return count, raw_bytes
+
+
+def export_snapshot(output_dir=OUTPUT_DIR):
+    """导出所有学习进度集合，返回快照目录"""
+    client = MongoClient(DB_HOST)
+    start = time.perf_counter()
+    created_at = datetime.datetime.now()
+    snapshot_dir = os.path.join(output_dir, created_at.strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    consistent = supports_snapshot(client)
+    if not consistent:
+        print("提示: 当前 MongoDB 不是副本集，无法使用 snapshot 读，各集合分别在导出时刻读取")
+    session = client.start_session(snapshot=True) if consistent else None
+
+    entries = []
+    total = 0
+    try:
+        for db_name, collection_name in COLLECTIONS:
+            collection = client[db_name].get_collection(collection_name, codec_options=RAW_CODEC_OPTIONS)
+            file_name = f'{db_name}.{collection_name}.bson.gz'
+            collection_start = time.perf_counter()
+            count, raw_bytes = export_collection(collection, os.path.join(snapshot_dir, file_name), session)
+            elapsed = time.perf_counter() - collection_start
+            total += count
+            entries.append({'db': db_name, 'collection': collection_name, 'file': file_name,
+                            'count': count, 'bytes': raw_bytes})
+            print(f"已导出: {db_name}.{collection_name}，共 {count} 条记录，"
+                  f"{count / max(elapsed, 1e-9):.0f} 条/秒，"
+                  f"压缩后 {os.path.getsize(os.path.join(snapshot_dir, file_name)) / 1024 / 1024:.1f} MB")
+    finally:
+        if session is not None:
+            session.end_session()
+        client.close()
+
+    manifest = {
+        'format': 'wordie-snapshot',
+        'version': FORMAT_VERSION,
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'consistent': consistent,
+        'collections': entries,
+    }
+    with open(os.path.join(snapshot_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    elapsed = time.perf_counter() - start
+    print(f"快照已写入 {snapshot_dir}，共 {total} 条记录，耗时 {elapsed:.1f} 秒，"
+          f"峰值内存 {format_memory(peak_memory_mb())}")
+    return snapshot_dir
+
+
+def iter_snapshot_file(file_path, raw=False):
+    """逐个读取快照文件中的文档；raw=True 时返回未解码的 RawBSONDocument，直接用于插入"""
+    codec_options = RAW_CODEC_OPTIONS if raw else bson.DEFAULT_CODEC_OPTIONS
+    with gzip.open(file_path, 'rb') as f:
+        yield from bson.decode_file_iter(f, codec_options=codec_options)
+
+
+def merge_batch(collection, batch, key_fields=None):
+    """用快照中的文档整体替换现有文档（不存在时插入），返回 (新插入数, 覆盖数)
+
+    不走增量导入：增量导入只在插入时写学习进度字段，恢复进度快照时必须覆盖它们。
+    """
+    operations = []
+    for document in batch:
+        if key_fields:
+            # 现有文档的 _id 可能与快照不同，替换内容中不能带 _id
+            key = {field: document.get(field) for field in key_fields}
+            document = {field: value for field, value in document.items() if field != '_id'}
+        else:
+            key = {'_id': document['_id']}
+        operations.append(ReplaceOne(key, document, upsert=True))
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return result.upserted_count, result.matched_count
+    except BulkWriteError as e:
+        print(f"{collection.name}: {len(e.details['writeErrors'])} 条记录写入失败")
+        return e.details['nUpserted'], e.details['nMatched']
+
+
+def restore_snapshot(snapshot_dir, mode='replace'):
+    """按 manifest 把快照恢复到原来的库和集合"""
+    with open(os.path.join(snapshot_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != 'wordie-snapshot' or manifest.get('version') != FORMAT_VERSION:
+        print(f"错误: {snapshot_dir} 不是可识别的快照")
+        return
+
+    client = MongoClient(DB_HOST)
+    start = time.perf_counter()
+    total = 0
+    for entry in manifest['collections']:
+        file_path = os.path.join(snapshot_dir, entry['file'])
+        db = client[entry['db']]
+        collection_start = time.perf_counter()
+
+        collection = db[entry['collection']]
+        # 恢复后的内容与上次导入时不同，清掉导入哈希，下次增量导入重新写入所有文档
+        clear_import_hashes(db, entry['collection'])
+        if mode == 'merge':
+            upserted = replaced = 0
+            batch = []
+            for document in iter_snapshot_file(file_path):
+                batch.append(document)
+                if len(batch) >= BATCH_SIZE:
+                    counts = merge_batch(collection, batch, MERGE_KEYS.get(entry['collection']))
+                    upserted, replaced = upserted + counts[0], replaced + counts[1]
+                    batch = []
+            if batch:
+                counts = merge_batch(collection, batch, MERGE_KEYS.get(entry['collection']))
+                upserted, replaced = upserted + counts[0], replaced + counts[1]
+            restored = upserted + replaced
+            detail = f"（新插入 {upserted}，覆盖 {replaced}）"
+        else:
+            # 清空现有数据（如果有）
+            collection.delete_many({})
+            restored = 0
+            batch = []
+            for document in iter_snapshot_file(file_path, raw=True):
+                batch.append(document)
+                if len(batch) >= BATCH_SIZE:
+                    restored += insert_batch(collection, batch)
+                    batch = []
+            if batch:
+                restored += insert_batch(collection, batch)
+            detail = ''
+
+        elapsed = time.perf_counter() - collection_start
+        total += restored
+        print(f"已恢复: {entry['db']}.{entry['collection']}，共 {restored}/{entry['count']} 条记录{detail}，"
+              f"{restored / max(elapsed, 1e-9):.0f} 条/秒")
+
+    client.close()
+    elapsed = time.perf_counter() - start
+    print(f"快照 {snapshot_dir} 已恢复，共 {total} 条记录，耗时 {elapsed:.1f} 秒，"
+          f"峰值内存 {format_memory(peak_memory_mb())}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='学习进度快照的导出与恢复')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='导出快照')
+    export_parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    restore_parser = subparsers.add_parser('restore', help='从快照恢复')
+    restore_parser.add_argument('snapshot_dir')
+    restore_parser.add_argument('--mode', choices=['replace', 'merge'], default='replace')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_snapshot(args.output_dir)
+    else:
+        restore_snapshot(args.snapshot_dir, args.mode)
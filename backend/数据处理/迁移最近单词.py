@@ -0,0 +1,42 @@
+from pymongo import MongoClient, ASCENDING
+
+# 数据库配置
+DB_HOST = 'mongodb://localhost:27017/'
+USER_DB_NAME = 'word_learning_v7'
+LAST_FIVE_WORDS_COLLECTION = 'last_five_words'
+DEFAULT_LEARNER_ID = 'default'  # 旧数据没有 learner_id 时归入的学习者
+MAX_LAST_WORDS_COUNT = 15
+
+
+def migrate_last_words():
+    """把旧的「每个单词一行、按 order 排序」格式合并成每个学习者一个文档
+
+    新格式为 {'_id': learner_id, 'words': [从旧到新]}，由后端用 $push + $slice 维护。
+    一次性迁移脚本，可重复执行；执行期间请停止后端服务。
+    """
+    client = MongoClient(DB_HOST)
+    collection = client[USER_DB_NAME][LAST_FIVE_WORDS_COLLECTION]
+
+    # 旧格式的行带有 order 字段，新文档没有
+    legacy_query = {'order': {'$exists': True}}
+    history = {}
+    for row in collection.find(legacy_query).sort('order', ASCENDING):
+        history.setdefault(row.get('learner_id') or DEFAULT_LEARNER_ID, []).append(row['word'])
+
+    for learner_id, words in history.items():
+        # 新文档中已有的记录比旧行更新，排在后面
+        collection.update_one(
+            {'_id': learner_id},
+            {'$push': {'words': {'$each': words, '$position': 0, '$slice': -MAX_LAST_WORDS_COUNT}}},
+            upsert=True
+        )
+    removed = collection.delete_many(legacy_query).deleted_count
+    if 'learner_id_order' in collection.index_information():
+        collection.drop_index('learner_id_order')
+
+    client.close()
+    print(f"已合并 {len(history)} 个学习者的最近单词，删除 {removed} 条旧记录")
+
+
+if __name__ == "__main__":
+    migrate_last_words()
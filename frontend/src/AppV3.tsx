@@ -46,6 +46,8 @@ function App() {
     const [showWord, setShowWord] = useState(true); // 修改为默认显示
     const [isLooping, setIsLooping] = useState(false);
     const [learnedWordCount, setLearnedWordCount] = useState(0);
+    // 服务端推送的统计数字，收到之前使用取词接口返回的值
+    const [liveStats, setLiveStats] = useState<{ today_learning_count?: number; pending_review_count?: number }>({});
     // 新增状态，用于控制例句、英文和短语的显示
     const [showExamplesAndPhrase, setShowExamplesAndPhrase] = useState(true); // 修改为默认显示
     // 新增状态，用于控制翻译和例句翻译的显示
@@ -133,6 +135,7 @@ function App() {
 
             setCurrentWord(formattedWord);
             setLearnedWordCount(prevCount => prevCount + 1);
+            prefetchCardAudio(formattedWord);
         } catch (err) {
             console.error('请求失败:', err);
             setError(err instanceof Error ? err.message : '网络请求失败');
@@ -170,6 +173,41 @@ function App() {
         }
     };
 
+    // 一次请求合成整张卡片的音频，之后播放直接命中 audioCache
+    const prefetchCardAudio = async (word: Word) => {
+        // 与后端 normalize_tts_text 一致，用于把返回结果对应回原文本
+        const normalize = (text: string) => text.replace(/\*\*/g, '').split(/\s+/).filter(Boolean).join(' ');
+        const texts = [word.word, word.phrase, ...word.examples.map(example => example.text)]
+            .filter((text): text is string => !!text && !audioCache.has(text));
+        if (texts.length === 0) {
+            return;
+        }
+        try {
+            const response = await fetch('/api/generate_audio/batch?format=multipart', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ texts }),
+            });
+            if (!response.ok) {
+                return;
+            }
+            const form = await response.formData();
+            const manifest = JSON.parse(form.get('manifest') as string);
+            for (const item of manifest.items) {
+                const audioBlob = item.part ? form.get(item.part) : null;
+                if (!(audioBlob instanceof Blob)) {
+                    continue;
+                }
+                const audioUrl = URL.createObjectURL(audioBlob);
+                texts.filter(text => normalize(text) === item.text).forEach(text => audioCache.set(text, audioUrl));
+            }
+        } catch (err) {
+            console.error('音频预取失败:', err);
+        }
+    };
+
     // 播放音频
     const playAudio = async (text: string) => {
         if (audioElement) {
@@ -321,6 +359,21 @@ function App() {
         }
     };
 
+    // 订阅统计数字的推送，作答、卡片到期时自动更新，无需轮询
+    useEffect(() => {
+        const events = new EventSource('/api/events');
+        const applyStats = (event: MessageEvent) => {
+            const data = JSON.parse(event.data);
+            setLiveStats(prev => ({
+                today_learning_count: data.today_learning_count ?? prev.today_learning_count,
+                pending_review_count: data.pending_review ?? prev.pending_review_count,
+            }));
+        };
+        events.addEventListener('snapshot', applyStats);
+        events.addEventListener('delta', applyStats);
+        return () => events.close();
+    }, []);
+
     // 组件挂载时获取下一个单词
     useEffect(() => {
         fetchNextWord();
@@ -474,8 +527,8 @@ function App() {
             </div>
 
             <div className="stats-container">
-                <p>今日学习单词数: {currentWord.today_learning_count}</p>
-                <p>待复习单词数: {currentWord?.pending_review_count || 0}</p>
+                <p>今日学习单词数: {liveStats.today_learning_count ?? currentWord.today_learning_count}</p>
+                <p>待复习单词数: {liveStats.pending_review_count ?? (currentWord?.pending_review_count || 0)}</p>
             </div>
 
                 <div className="card">